@@ -1,39 +1,56 @@
 # src/agents/architect.py
+import asyncio
 import re
 import base64
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from src.core.agent import OpenAIAssistantAgent
 from src.core.config import AgentConfig
 from src.core.messaging import Mensaje
 
+# Bloques de código Mermaid en la respuesta del asistente
+_MERMAID_RE = re.compile(r"```mermaid\n(.*?)```", re.DOTALL)
+
+# Descargas simultáneas de diagramas a mermaid.ink
+_MAX_DESCARGAS_DIAGRAMAS = 4
+
+# Instrucciones específicas para la generación de diagramas, añadidas a cada prompt de diseño
+_INSTRUCCIONES_DIAGRAMAS = """
+        IMPORTANTE: 
+        1. Genera un diseño técnico detallado basado en los requerimientos.
+        2. Incluye diagramas de arquitectura utilizando la sintaxis de Mermaid.
+        3. Para cada diagrama, usa el siguiente formato:
+
+        ```mermaid
+        // Código del diagrama aquí
+        ```
+
+        4. Asegúrate de incluir al menos un diagrama de arquitectura de alto nivel.
+        5. Proporciona una explicación detallada de cada componente y su interacción.
+        """
+
 
 class Architect(OpenAIAssistantAgent):
-    def __init__(self, config: AgentConfig):
-        super().__init__(config)
-        self.assistant = None
-        if self.client:
-            self.assistant = self._create_or_get_assistant()
-    
     def _create_or_get_assistant(self):
-        # Crea un nuevo asistente con las instrucciones del prompt
-        with open(self.config.prompt_path, "r", encoding="utf-8") as f:
-            instructions = f.read()
+        # Crea un nuevo asistente con las instrucciones del prompt (ya cargado por Agent)
+        instructions = self.prompt_template
         
-        # Lista los asistentes existentes
-        assistants = self.client.beta.assistants.list()
-        existing_assistant = next((a for a in assistants.data if a.name == self.config.name), None)
+        # Busca el asistente en la caché compartida de OpenAIAssistantAgent
+        existing_assistant = self._buscar_asistente_existente()
         
         if existing_assistant:
             return existing_assistant
         else:
-            return self.client.beta.assistants.create(
+            new_assistant = self.client.beta.assistants.create(
                 name=self.config.name,
                 description="Diseñador de soluciones técnicas",
                 model=self.config.model,
                 instructions=instructions
             )
+            self._recordar_asistente(new_assistant)
+            return new_assistant
 
     def run(self, requerimientos_funcionales: List[str]) -> List[str]:
         """
@@ -47,33 +64,59 @@ class Architect(OpenAIAssistantAgent):
         """
         iteration_id = self._generate_iteration_id()
 
+        prompt = self._preparar_diseno(requerimientos_funcionales, iteration_id)
+        if prompt is None:
+            return ["No se proporcionaron requerimientos funcionales."]
+
+        # Usar el método run_with_thread
+        texto = self.run_with_thread(prompt)
+
+        return self._procesar_diseno(texto, iteration_id)
+
+    async def arun(self, requerimientos_funcionales: List[str]) -> List[str]:
+        """
+        Variante asíncrona de run con el cliente asíncrono de OpenAI.
+
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a procesar.
+
+        Returns:
+            List[str]: Lista de líneas del diseño técnico generado.
+        """
+        iteration_id = self._generate_iteration_id()
+
+        prompt = self._preparar_diseno(requerimientos_funcionales, iteration_id)
+        if prompt is None:
+            return ["No se proporcionaron requerimientos funcionales."]
+
+        texto = await self.arun_with_thread(prompt)
+
+        # La descarga de diagramas y la escritura de archivos son bloqueantes
+        return await asyncio.to_thread(self._procesar_diseno, texto, iteration_id)
+
+    def _preparar_diseno(self, requerimientos_funcionales: List[str], iteration_id: str) -> Optional[str]:
+        """
+        Construye el prompt de diseño y notifica su inicio.
+
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a procesar.
+            iteration_id: ID de la iteración actual.
+
+        Returns:
+            El prompt, o None si no hay requerimientos (el error ya se ha guardado).
+        """
         # Verificar que los requerimientos no estén vacíos
         if not requerimientos_funcionales:
             error_msg = "No se proporcionaron requerimientos funcionales."
             print(f"[{self.config.name}] ⚠️ {error_msg}")
             self._save_output(error_msg, iteration_id)
-            return [error_msg]
+            return None
 
         # Formatear los requerimientos como texto
         requerimientos_texto = "\n".join([f"- {req}" for req in requerimientos_funcionales])
 
-        # Añadir instrucciones específicas para la generación de diagramas
-        instrucciones_adicionales = """
-        IMPORTANTE: 
-        1. Genera un diseño técnico detallado basado en los requerimientos.
-        2. Incluye diagramas de arquitectura utilizando la sintaxis de Mermaid.
-        3. Para cada diagrama, usa el siguiente formato:
-
-        ```mermaid
-        // Código del diagrama aquí
-        ```
-
-        4. Asegúrate de incluir al menos un diagrama de arquitectura de alto nivel.
-        5. Proporciona una explicación detallada de cada componente y su interacción.
-        """
-
         # Preparar el prompt para el diseño
-        prompt = self._format_prompt(requerimientos=requerimientos_texto) + "\n\n" + instrucciones_adicionales
+        prompt = self._format_prompt(requerimientos=requerimientos_texto) + "\n\n" + _INSTRUCCIONES_DIAGRAMAS
 
         # Notificar inicio de diseño si el sistema de mensajería está disponible
         if self._sistema_mensajeria:
@@ -88,9 +131,19 @@ class Architect(OpenAIAssistantAgent):
                 )
             )
 
-        # Usar el método run_with_thread
-        texto = self.run_with_thread(prompt)
+        return prompt
+
+    def _procesar_diseno(self, texto: str, iteration_id: str) -> List[str]:
+        """
+        Guarda el diseño y sus diagramas, y notifica que se ha completado.
 
+        Args:
+            texto: Respuesta del asistente.
+            iteration_id: ID de la iteración actual.
+
+        Returns:
+            List[str]: Lista de líneas del diseño técnico generado.
+        """
         # Extraer y guardar los diagramas como imágenes
         diagramas = self._extract_and_save_diagrams(texto, iteration_id)
 
@@ -117,6 +170,8 @@ class Architect(OpenAIAssistantAgent):
         """
         Extrae los diagramas de Mermaid del texto y los guarda como imágenes.
 
+        Las imágenes se descargan en paralelo: cada diagrama es una petición independiente a mermaid.ink.
+
         Args:
             texto: Texto que contiene los diagramas de Mermaid.
             iteration_id: ID de la iteración actual.
@@ -124,68 +179,83 @@ class Architect(OpenAIAssistantAgent):
         Returns:
             List[str]: Lista de rutas a los diagramas generados.
         """
-        # Patrón para encontrar bloques de código Mermaid
-        pattern = r"```mermaid\n(.*?)```"
-        matches = re.finditer(pattern, texto, re.DOTALL)
+        codigos = [match.group(1).strip() for match in _MERMAID_RE.finditer(texto)]
 
         diagrams_created = []  # Lista para almacenar las rutas de los diagramas creados
+        if codigos:
+            # Crear el directorio de salida si no existe
+            output_dir = Path(self.config.output_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+            with ThreadPoolExecutor(max_workers=min(_MAX_DESCARGAS_DIAGRAMAS, len(codigos))) as pool:
+                rutas = pool.map(
+                    lambda args: self._guardar_diagrama(output_dir, args[0], args[1], iteration_id),
+                    enumerate(codigos, 1)
+                )
+                diagrams_created = [ruta for ruta in rutas if ruta is not None]
+
+        if not diagrams_created and self.config.verbose:
+            print(f"[{self.config.name}] ℹ️ No se encontraron diagramas para guardar.")
 
-        for i, match in enumerate(matches, 1):
-            mermaid_code = match.group(1).strip()
+        # Devolvemos la lista de rutas a los diagramas creados
+        return diagrams_created
 
-            try:
-                # Crear el directorio de salida si no existe
-                output_dir = Path(self.config.output_dir)
-                output_dir.mkdir(parents=True, exist_ok=True)
+    def _guardar_diagrama(self, output_dir: Path, i: int, mermaid_code: str, iteration_id: str) -> Optional[str]:
+        """
+        Guarda un diagrama de Mermaid como .mmd e intenta convertirlo a imagen.
 
-                # Nombre del archivo de imagen
-                image_filename = f"{self.config.name.lower()}-diagram-{i}-{iteration_id}.png"
-                image_path = output_dir / image_filename
+        Args:
+            output_dir: Directorio de salida.
+            i: Número del diagrama dentro del diseño.
+            mermaid_code: Código Mermaid del diagrama.
+            iteration_id: ID de la iteración actual.
 
-                # Guardar el código Mermaid en un archivo de texto
-                mermaid_filename = f"{self.config.name.lower()}-diagram-{i}-{iteration_id}.mmd"
-                mermaid_path = output_dir / mermaid_filename
+        Returns:
+            Ruta de la imagen, o del .mmd si no se pudo convertir; None si falló el guardado.
+        """
+        try:
+            # Nombre del archivo de imagen
+            image_filename = f"{self.config.name.lower()}-diagram-{i}-{iteration_id}.png"
+            image_path = output_dir / image_filename
 
-                with open(mermaid_path, "w", encoding="utf-8") as f:
-                    f.write(mermaid_code)
+            # Guardar el código Mermaid en un archivo de texto
+            mermaid_filename = f"{self.config.name.lower()}-diagram-{i}-{iteration_id}.mmd"
+            mermaid_path = output_dir / mermaid_filename
 
-                # Intentar convertir el diagrama a imagen usando la API de Mermaid
-                try:
-                    # Codificar el código Mermaid en base64
-                    mermaid_base64 = base64.b64encode(mermaid_code.encode("utf-8")).decode("utf-8")
+            with open(mermaid_path, "w", encoding="utf-8") as f:
+                f.write(mermaid_code)
 
-                    # URL para la API de Mermaid
-                    url = f"https://mermaid.ink/img/{mermaid_base64}"
+            # Intentar convertir el diagrama a imagen usando la API de Mermaid
+            try:
+                # Codificar el código Mermaid en base64
+                mermaid_base64 = base64.b64encode(mermaid_code.encode("utf-8")).decode("utf-8")
 
-                    # Descargar la imagen
-                    response = requests.get(url, timeout=10)
+                # URL para la API de Mermaid
+                url = f"https://mermaid.ink/img/{mermaid_base64}"
 
-                    if response.status_code == 200:
-                        with open(image_path, "wb") as f:
-                            f.write(response.content)
+                # Descargar la imagen
+                response = requests.get(url, timeout=10)
 
-                        diagrams_created.append(str(image_path))
+                if response.status_code == 200:
+                    with open(image_path, "wb") as f:
+                        f.write(response.content)
 
-                        if self.config.verbose:
-                            print(f"[{self.config.name}] ✅ Diagrama guardado en: {image_path}")
-                    else:
-                        print(f"[{self.config.name}] ⚠️ Error al generar el diagrama {i}: {response.status_code}")
-                        # Aún así, agregamos la ruta del archivo .mmd a la lista de diagramas creados
-                        diagrams_created.append(str(mermaid_path))
+                    if self.config.verbose:
+                        print(f"[{self.config.name}] ✅ Diagrama guardado en: {image_path}")
+                    return str(image_path)
 
-                except Exception as e:
-                    print(f"[{self.config.name}] ⚠️ Error al generar el diagrama {i}: {str(e)}")
-                    # Aún si falla la conversión a imagen, guardamos el archivo .mmd
-                    diagrams_created.append(str(mermaid_path))
+                print(f"[{self.config.name}] ⚠️ Error al generar el diagrama {i}: {response.status_code}")
+                # Aún así, devolvemos la ruta del archivo .mmd
+                return str(mermaid_path)
 
             except Exception as e:
-                print(f"[{self.config.name}] ⚠️ Error al procesar el diagrama {i}: {str(e)}")
+                print(f"[{self.config.name}] ⚠️ Error al generar el diagrama {i}: {str(e)}")
+                # Aún si falla la conversión a imagen, guardamos el archivo .mmd
+                return str(mermaid_path)
 
-        if not diagrams_created and self.config.verbose:
-            print(f"[{self.config.name}] ℹ️ No se encontraron diagramas para guardar.")
-
-        # Devolvemos la lista de rutas a los diagramas creados
-        return diagrams_created
+        except Exception as e:
+            print(f"[{self.config.name}] ⚠️ Error al procesar el diagrama {i}: {str(e)}")
+            return None
 
     def __str__(self):
         return f"{self.config.name}: Diseñador de soluciones técnicas"
@@ -1,15 +1,22 @@
 # src/agents/developer.py
+import asyncio
 import os
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Union
 from pathlib import Path
 from datetime import datetime
 
-from core.messaging import Mensaje
+from src.core.messaging import Mensaje
 from src.core.agent import AnthropicAgent
 
+# max_tokens de las respuestas de implementación, que incluyen archivos completos
+_MAX_TOKENS_IMPLEMENTACION = 12000
+
 
 class Developer(AnthropicAgent):
+    # Las salidas del Developer se guardan en formato Markdown
+    _output_ext = "md"
+
     def __init__(self, *args, **kwargs):
         """
         Inicializa el agente Developer.
@@ -36,6 +43,56 @@ class Developer(AnthropicAgent):
         Returns:
             List[str]: Lista de líneas de resumen de la implementación.
         """
+        preparado = self._preparar_implementacion(requerimientos_funcionales, diseno_tecnico)
+        if isinstance(preparado, list):
+            return preparado
+        iteration_id, user_message = preparado
+
+        try:
+            # Utilizamos AnthropicAgent que ya establece el prompt_template como system
+            # y enviamos el mensaje del usuario con los requerimientos y diseño
+            response = super().run(message=user_message, max_tokens=_MAX_TOKENS_IMPLEMENTACION)
+            return self._procesar_implementacion(response, iteration_id)
+
+        except Exception as e:
+            return self._notificar_error_implementacion(e, iteration_id)
+
+    async def arun(self, requerimientos_funcionales: List[str], diseno_tecnico: List[str]) -> List[str]:
+        """
+        Variante asíncrona de run con el cliente asíncrono de Anthropic.
+
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a implementar.
+            diseno_tecnico: Lista de líneas del diseño técnico.
+
+        Returns:
+            List[str]: Lista de líneas de resumen de la implementación.
+        """
+        # Leer el estado del proyecto y escribir los archivos son operaciones bloqueantes
+        preparado = await asyncio.to_thread(self._preparar_implementacion, requerimientos_funcionales, diseno_tecnico)
+        if isinstance(preparado, list):
+            return preparado
+        iteration_id, user_message = preparado
+
+        try:
+            response = await super().arun(message=user_message, max_tokens=_MAX_TOKENS_IMPLEMENTACION)
+            return await asyncio.to_thread(self._procesar_implementacion, response, iteration_id)
+
+        except Exception as e:
+            return self._notificar_error_implementacion(e, iteration_id)
+
+    def _preparar_implementacion(self, requerimientos_funcionales: List[str],
+                                 diseno_tecnico: List[str]) -> Union[Tuple[str, str], List[str]]:
+        """
+        Valida las entradas y construye el mensaje de implementación.
+
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a implementar.
+            diseno_tecnico: Lista de líneas del diseño técnico.
+
+        Returns:
+            Tupla (iteration_id, mensaje), o la lista de resumen con el error si faltan entradas.
+        """
         # Verificar que los atributos importantes estén inicializados
         if not hasattr(self, 'project_path') or self.project_path is None:
             self.project_path = Path(self.config.output_dir) / "proyecto"
@@ -78,64 +135,79 @@ class Developer(AnthropicAgent):
             estado_actual
         )
 
-        # Configuramos max_tokens para respuestas largas
-        max_tokens = 12000
+        return iteration_id, user_message
 
-        try:
-            # Utilizamos AnthropicAgent que ya establece el prompt_template como system
-            # y enviamos el mensaje del usuario con los requerimientos y diseño
-            response = super().run(message=user_message, max_tokens=max_tokens)
+    def _procesar_implementacion(self, response: str, iteration_id: str) -> List[str]:
+        """
+        Extrae los archivos de la respuesta, actualiza el proyecto y notifica el resultado.
 
-            # Procesar la respuesta para extraer los archivos y la documentación
-            documentacion, instrucciones, estructura, cambios, archivos = self._procesar_respuesta(response)
+        Args:
+            response: Respuesta completa del modelo.
+            iteration_id: ID de la iteración.
 
-            # Actualizar la estructura del proyecto
-            resumen = self._actualizar_proyecto(documentacion, instrucciones, estructura, cambios, archivos,
-                                                iteration_id)
+        Returns:
+            List[str]: Lista de líneas de resumen de la implementación.
+        """
+        # Procesar la respuesta para extraer los archivos y la documentación
+        documentacion, instrucciones, estructura, cambios, archivos = self._procesar_respuesta(response)
 
-            # Guardar también la respuesta original completa para referencia
-            self._save_output(response, f"{iteration_id}-respuesta-completa")
+        # Actualizar la estructura del proyecto
+        resumen = self._actualizar_proyecto(documentacion, instrucciones, estructura, cambios, archivos,
+                                            iteration_id)
 
-            # Si el sistema de mensajería está disponible, notificar éxito
-            if hasattr(self, '_sistema_mensajeria') and self._sistema_mensajeria:
-                archivos_info = [{"ruta": a["ruta"], "es_nuevo": not (self.project_path / a["ruta"]).exists()} for a in
-                                 archivos]
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="implementacion_exitosa",
-                        contenido=f"Implementación exitosa en iteración {self.iteration_count}",
-                        metadata={
-                            "archivos_procesados": len(archivos),
-                            "archivos_info": archivos_info,
-                            "proyecto_path": str(self.project_path) if self.project_path else None
-                        }
-                    )
+        # Guardar también la respuesta original completa para referencia
+        self._save_output(response, f"{iteration_id}-respuesta-completa")
+
+        # Si el sistema de mensajería está disponible, notificar éxito
+        if hasattr(self, '_sistema_mensajeria') and self._sistema_mensajeria:
+            archivos_info = [{"ruta": a["ruta"], "es_nuevo": not (self.project_path / a["ruta"]).exists()} for a in
+                             archivos]
+            self._sistema_mensajeria.publicar(
+                Mensaje(
+                    emisor=self.config.name,
+                    tipo="implementacion_exitosa",
+                    contenido=f"Implementación exitosa en iteración {self.iteration_count}",
+                    metadata={
+                        "archivos_procesados": len(archivos),
+                        "archivos_info": archivos_info,
+                        "proyecto_path": str(self.project_path) if self.project_path else None
+                    }
                 )
+            )
 
-            return resumen
+        return resumen
 
-        except Exception as e:
-            error_msg = f"Error durante la implementación: {str(e)}"
-            print(f"[{self.config.name}] ⚠️ {error_msg}")
+    def _notificar_error_implementacion(self, e: Exception, iteration_id: str) -> List[str]:
+        """
+        Informa de un error durante la implementación y lo guarda como resumen.
 
-            # Si el sistema de mensajería está disponible, notificar error
-            if hasattr(self, '_sistema_mensajeria') and self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="error_implementacion",
-                        contenido=error_msg,
-                        metadata={
-                            "error": str(e),
-                            "iteracion": self.iteration_count
-                        }
-                    )
+        Args:
+            e: Excepción producida.
+            iteration_id: ID de la iteración.
+
+        Returns:
+            List[str]: Resumen con el mensaje de error.
+        """
+        error_msg = f"Error durante la implementación: {str(e)}"
+        print(f"[{self.config.name}] ⚠️ {error_msg}")
+
+        # Si el sistema de mensajería está disponible, notificar error
+        if hasattr(self, '_sistema_mensajeria') and self._sistema_mensajeria:
+            self._sistema_mensajeria.publicar(
+                Mensaje(
+                    emisor=self.config.name,
+                    tipo="error_implementacion",
+                    contenido=error_msg,
+                    metadata={
+                        "error": str(e),
+                        "iteracion": self.iteration_count
+                    }
                 )
+            )
 
-            # Crear un mensaje de error como resumen
-            self._save_output(f"Error: {error_msg}\n\nDetalles del error: {str(e)}", f"{iteration_id}-error")
-            return [error_msg]
+        # Crear un mensaje de error como resumen
+        self._save_output(f"Error: {error_msg}\n\nDetalles del error: {str(e)}", f"{iteration_id}-error")
+        return [error_msg]
 
     def _obtener_estado_actual_proyecto(self) -> str:
         """
@@ -455,27 +527,6 @@ class Developer(AnthropicAgent):
 
         return resumen
 
-    def _save_output(self, content: str, iteration_id: str) -> str:
-        """
-        Guarda la salida en un archivo de texto.
-        Sobrescribe el método de la clase base para usar formato Markdown.
-
-        Args:
-            content: Contenido a guardar
-            iteration_id: ID de la iteración
-
-        Returns:
-            str: Ruta al archivo guardado
-        """
-        Path(self.config.output_dir).mkdir(parents=True, exist_ok=True)
-        filename = f"{self.config.name.lower()}-{iteration_id}.md"
-        full_path = os.path.join(self.config.output_dir, filename)
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        if self.config.verbose:
-            print(f"[{self.config.name}] Resultado guardado en: {full_path}")
-        return full_path
-
     def __str__(self):
         return f"{self.config.name}: Desarrollador de implementaciones"
 
@@ -1,37 +1,304 @@
 # src/agents/sme.py
+import asyncio
+import hashlib
+import io
 import json
 import re
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Union, Dict, Any
+from typing import List, Union, Dict, Any, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
 from src.core.messaging import Mensaje
 from src.core.agent import OpenAIAssistantAgent
 from src.core.config import AgentConfig
 from src.core.models import FunctionalRequirement, RequirementsList
+from src.core.throttle import estimar_tokens
+
+# Expresiones regulares compiladas una sola vez a nivel de módulo
+_REQ_ID_RE = re.compile(r'REQ-\d+')
+_STATUS_RE = re.compile(r'(REQ-\d+)(?:: | - )(?:COMPLETO|CUMPLIDO)')
+_CODE_BLOCK_RE = re.compile(r'```[\w]*\n(.*?)```', re.DOTALL)
+_MAX_CODE_BLOCK_CHARS = 256 * 1024
+
+# Decodificador reutilizable para leer JSON directamente desde la respuesta
+_DECODER = json.JSONDecoder()
+
+# Mapeo de los estados del asistente al formato de Pydantic
+_STATUS_MAP = {
+    "CUMPLIDO": "Completo",
+    "PARCIAL": "Parcial",
+    "PENDIENTE": "Pendiente"
+}
+
+# Validadores de Pydantic construidos una sola vez para los requerimientos generados
+_REQ_ADAPTER = TypeAdapter(FunctionalRequirement)
+_REQ_LIST_ADAPTER = TypeAdapter(List[FunctionalRequirement])
+
+
+def _is_requirement_line(line: str) -> bool:
+    """
+    Indica si una línea parece un requerimiento: "REQ-<n>", "<n>." o "-" al inicio.
+
+    Usa comparaciones de prefijo en lugar de una expresión regular por línea.
+
+    Args:
+        line: Línea de la respuesta del asistente.
+
+    Returns:
+        True si la línea tiene formato de requerimiento.
+    """
+    texto = line.strip()
+    if texto.startswith("-"):
+        return True
+    if texto.startswith("REQ-"):
+        return texto[4:5].isdigit()
+    if texto[:1].isdigit():
+        digitos = len(texto) - len(texto.lstrip("0123456789"))
+        return texto[digitos:digitos + 1] == "."
+    return False
+
+def _extract_json_blob(texto: str) -> Optional[str]:
+    """
+    Localiza el bloque JSON de una respuesta usando búsquedas lineales con str.find.
+
+    Prioriza un bloque ```json y luego cualquier bloque ```.
+
+    Args:
+        texto: Respuesta del asistente.
+
+    Returns:
+        El contenido del bloque, o None si la respuesta no tiene bloques de código.
+    """
+    inicio = texto.find("```json")
+    if inicio != -1:
+        inicio += len("```json")
+        fin = texto.find("```", inicio)
+        if fin != -1:
+            return texto[inicio:fin].strip()
+
+    inicio = texto.find("```")
+    if inicio != -1:
+        inicio += len("```")
+        fin = texto.find("```", inicio)
+        if fin != -1:
+            contenido = texto[inicio:fin]
+            # Descartar una posible etiqueta de lenguaje en la primera línea del bloque
+            primera_linea, _, resto = contenido.partition("\n")
+            if primera_linea.strip().isalpha():
+                contenido = resto
+            return contenido.strip()
+
+    return None
+
+
+def _parse_json_response(texto: str) -> Optional[Any]:
+    """
+    Decodifica el JSON de una respuesta con el escáner en C de json.JSONDecoder.raw_decode.
+
+    Primero decodifica directamente desde la primera '{' (si la respuesta es JSON puro es
+    la única pasada); después prueba el contenido de un bloque de código y, por último,
+    reintenta raw_decode desde cada '{' siguiente hasta encontrar un objeto válido.
+
+    Args:
+        texto: Respuesta del asistente.
+
+    Returns:
+        El objeto decodificado, o None si la respuesta no contiene JSON.
+    """
+    inicio = texto.find("{")
+    if inicio != -1:
+        try:
+            data, _ = _DECODER.raw_decode(texto, inicio)
+            return data
+        except json.JSONDecodeError:
+            pass
+
+    json_str = _extract_json_blob(texto)
+    if json_str:
+        return json.loads(json_str)
+
+    # Sin bloque de código: probar desde cada '{' posterior
+    ultimo_error = None
+    while inicio != -1:
+        inicio = texto.find("{", inicio + 1)
+        if inicio == -1:
+            break
+        try:
+            data, _ = _DECODER.raw_decode(texto, inicio)
+            return data
+        except json.JSONDecodeError as e:
+            ultimo_error = e
 
+    if ultimo_error is not None:
+        raise ultimo_error
+    return None
 
-class SME(OpenAIAssistantAgent):
-    def __init__(self, config: AgentConfig):
-        super().__init__(config)
-        self.requirements_list = RequirementsList()
 
-    def run(self, prompt_sme: str) -> RequirementsList:
-        """
-        Ejecuta el agente SME, procesando la descripción general del proyecto.
+# Extensiones de archivos relevantes para revisión y directorios que nunca se recorren
+_CODE_EXTS = frozenset({'.js', '.jsx', '.ts', '.tsx', '.py', '.html', '.css', '.php', '.java', '.go', '.rb'})
+_SKIP_DIRS = frozenset({'node_modules', '__pycache__', '.git', 'dist', 'build', '.venv'})
+_MAX_FILE_BYTES = 512 * 1024
 
-        Args:
-            prompt_sme: Prompt para el agente SME, generalmente la descripción del proyecto.
+# Número máximo de verificaciones de código recordadas por el SME
+_MAX_VERIFICACIONES_CACHE = 64
+
+# Tokens acumulados en el thread de verificación a partir de los cuales se empieza uno nuevo:
+# cada run vuelve a leer todos los mensajes anteriores, que incluyen el proyecto completo
+_MAX_TOKENS_THREAD_VERIFICACION = 48_000
 
-        Returns:
-            RequirementsList: Lista estructurada de requerimientos funcionales generados.
-        """
-        iteration_id = self._generate_iteration_id()
+# A partir de este número de verificaciones conviene usar la Batch API
+_MIN_BATCH_ITEMS = 4
 
-        # Modificamos el prompt para solicitar una respuesta estructurada
-        prompt_actualizado = f"""
-        {prompt_sme}
+# Categorías de archivos del proyecto para verificar_requerimientos_proyecto
+_FRONTEND_EXTS = frozenset({'.js', '.jsx', '.ts', '.tsx', '.html', '.css', '.vue', '.svelte'})
+_BACKEND_EXTS = frozenset({'.py', '.java', '.php', '.go', '.rb'})
+_FRONTEND_DIRS = ('frontend', 'client', 'public')
+_BACKEND_DIRS = ('backend', 'server', 'api')
+
+
+def _huella_prompt(prompt: str) -> str:
+    """Hash corto de un prompt, para detectar verificaciones repetidas."""
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _categorize(path_str: str, ext: str) -> str:
+    """
+    Determina la categoría de un archivo por su ruta y, en su defecto, por su extensión.
+
+    Args:
+        path_str: Ruta del archivo como cadena.
+        ext: Extensión en minúsculas (incluyendo el punto).
+
+    Returns:
+        "frontend", "backend" o "config".
+    """
+    if any(nombre in path_str for nombre in _FRONTEND_DIRS):
+        return "frontend"
+    if any(nombre in path_str for nombre in _BACKEND_DIRS):
+        return "backend"
+    if ext in _FRONTEND_EXTS:
+        return "frontend"
+    if ext in _BACKEND_EXTS:
+        return "backend"
+    return "config"
+
+@lru_cache(maxsize=64)
+def _parse_requirement_strings(key: Tuple[str, ...]) -> Tuple[FunctionalRequirement, ...]:
+    """Parsea una vez cada conjunto de cadenas de requerimientos y guarda el resultado."""
+    return tuple(RequirementsList.from_strings(list(key)))
+
+
+def _deduplicate_requirements(reqs: List[FunctionalRequirement]) -> List[FunctionalRequirement]:
+    """
+    Descarta los requerimientos con una descripción ya vista, conservando el orden.
+
+    La comparación ignora mayúsculas y espacios repetidos, de modo que las repeticiones del
+    modelo no se envían al Architect y al Developer en cada iteración.
+
+    Args:
+        reqs: Requerimientos validados.
+
+    Returns:
+        Lista sin descripciones duplicadas.
+    """
+    vistos = set()
+    unicos = []
+    for req in reqs:
+        clave = " ".join(req.description.casefold().split())
+        if clave not in vistos:
+            vistos.add(clave)
+            unicos.append(req)
+    return unicos
+
+
+def _unir_codigo(codigo: Union[List[str], str]) -> str:
+    """
+    Une el código en un único texto; un str se usa tal cual (unirlo con join lo recorrería carácter a carácter).
+
+    Args:
+        codigo: Código como lista de líneas o como texto ya unido.
+
+    Returns:
+        Código como texto.
+    """
+    return codigo if isinstance(codigo, str) else "\n".join(codigo)
 
-        Genera una lista completa de requerimientos funcionales basados en la descripción anterior.
+
+def _texto_requerimientos(requerimientos: Union[str, List[Any], RequirementsList]) -> str:
+    """
+    Representa los requerimientos como texto "ID: descripción", uno por línea.
+
+    Se usa tanto en el prompt como en la clave de caché, de modo que la clave depende del
+    contenido de los requerimientos y no de la representación str() de los modelos.
+
+    Args:
+        requerimientos: Texto, lista de cadenas o de FunctionalRequirement, o RequirementsList.
+
+    Returns:
+        Requerimientos como texto.
+    """
+    if isinstance(requerimientos, str):
+        return requerimientos
+    return "\n".join(
+        f"{req.id}: {req.description}" if isinstance(req, FunctionalRequirement) else str(req)
+        for req in requerimientos
+    )
+
+
+def _reqs_from_strings(requerimientos: List[str]) -> RequirementsList:
+    """
+    Construye un RequirementsList a partir de cadenas reutilizando el parseo en caché.
+
+    Cada llamada recibe copias de los requerimientos, de modo que las actualizaciones
+    de estado no se filtran entre verificaciones.
+
+    Args:
+        requerimientos: Lista de requerimientos en formato "REQ-XX: descripción".
+
+    Returns:
+        RequirementsList: Lista de requerimientos independiente de la caché.
+    """
+    reqs_list = RequirementsList()
+    reqs_list.extend(req.model_copy() for req in _parse_requirement_strings(tuple(requerimientos)))
+    return reqs_list
+
+
+def _apply_requirement_statuses(reqs_list: RequirementsList, requirements_status: List[Dict[str, Any]]):
+    """
+    Actualiza el estado de los requerimientos según la respuesta de verificación.
+
+    Args:
+        reqs_list: Requerimientos a actualizar.
+        requirements_status: Lista de estados devuelta por el asistente.
+    """
+    # Índice por ID para no recorrer reqs_list en cada estado
+    reqs_por_id = reqs_list.by_id()
+
+    for req_status in requirements_status:
+        req = reqs_por_id.get(req_status.get("id"))
+        if req is not None:
+            req.status = _STATUS_MAP.get(req_status.get("status", "").upper(), "Pendiente")
+
+
+@dataclass(slots=True, frozen=True)
+class VerificacionResult:
+    """Resultado de verificar_requerimientos_proyecto."""
+    todos_completos: bool
+    requirements_status: tuple = ()
+    motivo: Optional[str] = None  # Por qué no se pudo verificar (proyecto inexistente, vacío, sin respuesta, run fallido)
+
+
+# Plantillas de prompt constantes; solo se sustituyen las partes dinámicas en cada llamada.
+# Las instrucciones fijas van primero y el contenido variable al final, para que el prefijo
+# del prompt sea idéntico entre llamadas y lo aproveche la caché automática de OpenAI.
+_PROMPT_GENERACION = """
+        Genera una lista completa de requerimientos funcionales basados en la descripción que aparece al final.
 
         FORMATO DE RESPUESTA:
         Responde con una lista de requerimientos funcionales en formato JSON con la siguiente estructura:
@@ -51,8 +318,147 @@ class SME(OpenAIAssistantAgent):
         - La descripción debe ser clara y específica
         - La prioridad debe ser Alta, Media o Baja
         - Asegúrate de que la respuesta sea un JSON válido
+
+        DESCRIPCIÓN:
+        {prompt_sme}
         """
 
+_PROMPT_VERIFICACION = """
+        Evalúa el código desarrollado y determina qué requerimientos se han cumplido y cuáles faltan.
+
+        Para cada requerimiento, indica claramente si:
+        1. CUMPLIDO: El requerimiento está completamente implementado
+        2. PARCIAL: El requerimiento está parcialmente implementado (explica qué falta)
+        3. PENDIENTE: El requerimiento no ha sido implementado
+
+        FORMATO DE RESPUESTA:
+        Responde con un análisis del estado de cada requerimiento en formato JSON:
+        {{
+            "requirements_status": [
+                {{
+                    "id": "REQ-01",
+                    "status": "CUMPLIDO|PARCIAL|PENDIENTE",
+                    "analysis": "Análisis detallado de por qué tiene ese estado"
+                }},
+                ...
+            ],
+            "all_complete": true|false
+        }}
+
+        IMPORTANTE: Asegúrate de incluir el campo "all_complete" con el valor true solo si TODOS los requerimientos están CUMPLIDOS.
+
+        Requerimientos originales:
+        {requerimientos}
+
+        Código actual:
+        ```
+        {codigo}
+        ```
+        """
+
+
+_PROMPT_VERIFICACION_PROYECTO = """
+        Evalúa el código del proyecto para determinar qué requerimientos se han cumplido y cuáles faltan.
+
+        TAREAS:
+        1. Analiza cada requerimiento y determina su estado actual.
+        2. Para cada requerimiento, indica claramente si está:
+           - CUMPLIDO: El requerimiento está completamente implementado
+           - PARCIAL: El requerimiento está parcialmente implementado (explica qué falta)
+           - PENDIENTE: El requerimiento no ha sido implementado
+        3. Proporciona evidencia específica en el código para justificar tu evaluación.
+
+        FORMATO DE RESPUESTA:
+        Responde con un análisis del estado de cada requerimiento en formato JSON:
+        {{
+            "requirements_status": [
+                {{
+                    "id": "REQ-01",
+                    "status": "CUMPLIDO|PARCIAL|PENDIENTE",
+                    "evidence": "Explicación detallada con referencias al código",
+                    "missing": "Lo que falta por implementar (si aplica)"
+                }},
+                ...
+            ],
+            "all_complete": true|false,
+            "summary": "Resumen general del estado del proyecto"
+        }}
+
+        IMPORTANTE: Busca evidencia concreta en el código. Si un archivo no está en la lista pero es mencionado en otros archivos, asume que existe.
+
+        Requerimientos funcionales a verificar:
+        {requerimientos}
+
+        {estructura}
+
+        Código del proyecto (archivos principales):
+        {archivos}
+        """
+
+_PROMPT_ACLARACION = """
+        Se solicita una aclaración sobre {objetivo}.
+
+        Consulta: {consulta}
+
+        Proporciona una explicación detallada {alcance}, 
+        incluyendo:
+        1. Qué funcionalidad debe implementarse exactamente
+        2. Criterios de aceptación
+        3. Consideraciones técnicas importantes
+        4. Posibles desafíos de implementación
+
+        Responde de manera clara y concisa, pero completa.
+        """
+
+_PROMPT_VERIFICACION_IMPLEMENTACION = """
+        Se solicita verificar la implementación de código proporcionada.
+
+        {requerimientos}
+
+        {encabezado}
+        {codigo}
+
+        Evalúa si la implementación cumple con los requerimientos. Incluye:
+        1. Análisis de qué requisitos se cumplen y cuáles no
+        2. Problemas o deficiencias en la implementación
+        3. Sugerencias para mejorar o completar la implementación
+
+        Sé específico y detallado en tu análisis.
+        """
+
+
+class SME(OpenAIAssistantAgent):
+    def __init__(self, config: AgentConfig):
+        super().__init__(config)
+        self.requirements_list = RequirementsList()
+        # Caché de lecturas del proyecto: ruta -> (mtime_ns, tamaño, contenido truncado)
+        self._file_cache: Dict[str, tuple] = {}
+        # Resultados de verificar_codigo_requerimientos por hash de (modelo, código, requerimientos)
+        self._verificaciones_cache: "OrderedDict[str, str]" = OrderedDict()
+        # Las verificaciones en lote comparten la caché desde varios hilos
+        self._verificaciones_lock = threading.Lock()
+        # Thread del asistente compartido por las verificaciones del proyecto y tokens enviados a él
+        self._verify_thread = None
+        self._tokens_verify_thread = 0
+        # Última verificación por tipo ("proyecto" o "codigo"): (hash del prompt, respuesta). Si los
+        # requerimientos y el código no cambiaron, el prompt es idéntico y se reutiliza la respuesta
+        self._ultimas_verificaciones: Dict[str, Tuple[str, str]] = {}
+
+    def run(self, prompt_sme: str) -> RequirementsList:
+        """
+        Ejecuta el agente SME, procesando la descripción general del proyecto.
+
+        Args:
+            prompt_sme: Prompt para el agente SME, generalmente la descripción del proyecto.
+
+        Returns:
+            RequirementsList: Lista estructurada de requerimientos funcionales generados.
+        """
+        iteration_id = self._generate_iteration_id()
+
+        # Modificamos el prompt para solicitar una respuesta estructurada
+        prompt_actualizado = _PROMPT_GENERACION.format(prompt_sme=prompt_sme)
+
         # Notificar inicio de generación de requerimientos
         if self._sistema_mensajeria:
             self._sistema_mensajeria.publicar(
@@ -66,8 +472,8 @@ class SME(OpenAIAssistantAgent):
                 )
             )
 
-        # Usar el nuevo método run_with_thread
-        texto = self.run_with_thread(prompt_actualizado)
+        # Usar el nuevo método run_with_thread (con response_format, si está configurado, el JSON llega directo)
+        texto = self.run_with_thread(prompt_actualizado, **self._run_kwargs())
 
         # Guardar la salida
         self._save_output(texto, iteration_id)
@@ -75,27 +481,29 @@ class SME(OpenAIAssistantAgent):
         # Intentar extraer el JSON de la respuesta
         try:
             # El resto del código sigue igual, procesando la respuesta
-            # Buscar el JSON en la respuesta (puede estar en un bloque de código)
-            json_match = re.search(r'```json\n(.*?)\n```|```(.*?)```|({.*})', texto, re.DOTALL)
-
-            if json_match:
-                json_str = json_match.group(1) or json_match.group(2) or json_match.group(3)
-                # Transformar el JSON en objetos de requerimientos
-                data = json.loads(json_str)
+            # Decodificar el JSON de la respuesta (puede estar en un bloque de código)
+            data = _parse_json_response(texto)
 
+            if data is not None:
                 # Crear la lista de requerimientos desde el JSON
                 self.requirements_list = self._create_requirements_from_json(data)
             else:
                 # Si no se pudo extraer el JSON, intentar procesar el texto como requerimientos
-                # Buscar líneas que parezcan requerimientos
-                lines = texto.split("\n")
-                req_lines = [line for line in lines if re.match(r'^REQ-\d+|^\d+\.|^-', line.strip())]
-
-                if req_lines:
-                    self.requirements_list = RequirementsList.from_strings(req_lines)
-                else:
-                    # Si no hay formato claro, usar todo el texto como entrada
-                    self.requirements_list = RequirementsList.from_strings(lines)
+                # Buscar líneas que parezcan requerimientos; en la misma pasada se guardan las
+                # no vacías como respaldo por si no hay ninguna con formato claro
+                req_lines = []
+                non_empty = []
+                for line in texto.splitlines():
+                    if not line.strip():
+                        continue
+                    non_empty.append(line)
+                    if _is_requirement_line(line):
+                        req_lines.append(line)
+
+                # Si no hay formato claro, usar todo el texto como entrada
+                self.requirements_list = RequirementsList(requirements=_deduplicate_requirements(
+                    RequirementsList.from_strings(req_lines or non_empty).requirements
+                ))
 
             # Notificar completado si el sistema de mensajería está disponible
             if self._sistema_mensajeria:
@@ -139,15 +547,14 @@ class SME(OpenAIAssistantAgent):
 
             return self.requirements_list
 
-    # 3. Actualiza el método verificar_requerimientos para usar run_with_thread:
     def verificar_requerimientos(self, requerimientos_funcionales: Union[List[str], RequirementsList],
-                                 codigo_actual: List[str]) -> bool:
+                                 codigo_actual: Union[List[str], str]) -> bool:
         """
         Verifica si todos los requerimientos funcionales están implementados en el código actual.
 
         Args:
             requerimientos_funcionales: Lista de requerimientos funcionales a verificar.
-            codigo_actual: Código actual implementado.
+            codigo_actual: Código actual implementado, como lista de líneas o como texto ya unido.
 
         Returns:
             bool: True si todos los requerimientos están implementados, False en caso contrario.
@@ -156,63 +563,37 @@ class SME(OpenAIAssistantAgent):
 
         # Convertir requerimientos a RequirementsList si es una lista de strings
         if isinstance(requerimientos_funcionales, list):
-            reqs_list = RequirementsList.from_strings(requerimientos_funcionales)
+            reqs_list = _reqs_from_strings(requerimientos_funcionales)
         else:
             reqs_list = requerimientos_funcionales
 
         # Formatear los requerimientos para el prompt
         reqs_formatted = "\n".join([f"- {req.id}: {req.description}" for req in reqs_list])
+        # Unir el código una sola vez para el prompt y los metadatos
+        codigo_str = _unir_codigo(codigo_actual)
+        if isinstance(codigo_actual, str):
+            codigo_actual = codigo_str.splitlines()
+        codigo_len = len(codigo_str)
 
         # Preparar el prompt para la verificación
-        prompt = f"""
-        Evalúa el código desarrollado y determina qué requerimientos se han cumplido y cuáles faltan.
-
-        Requerimientos originales:
-        {reqs_formatted}
-
-        Código actual:
-        ```
-        {'\n'.join(codigo_actual)}
-        ```
-
-        Para cada requerimiento, indica claramente si:
-        1. CUMPLIDO: El requerimiento está completamente implementado
-        2. PARCIAL: El requerimiento está parcialmente implementado (explica qué falta)
-        3. PENDIENTE: El requerimiento no ha sido implementado
-
-        FORMATO DE RESPUESTA:
-        Responde con un análisis del estado de cada requerimiento en formato JSON:
-        {{
-            "requirements_status": [
-                {{
-                    "id": "REQ-01",
-                    "status": "CUMPLIDO|PARCIAL|PENDIENTE",
-                    "analysis": "Análisis detallado de por qué tiene ese estado"
-                }},
-                ...
-            ],
-            "all_complete": true|false
-        }}
-
-        IMPORTANTE: Asegúrate de incluir el campo "all_complete" con el valor true solo si TODOS los requerimientos están CUMPLIDOS.
-        """
-
-        # Notificar inicio de verificación si el sistema de mensajería está disponible
-        if self._sistema_mensajeria:
-            self._sistema_mensajeria.publicar(
-                Mensaje(
-                    emisor=self.config.name,
-                    tipo="verificando_requerimientos",
-                    contenido=f"Verificando {len(reqs_list)} requerimientos contra {len(codigo_actual)} líneas de código",
-                    metadata={
-                        "requerimientos_count": len(reqs_list),
-                        "codigo_length": len('\n'.join(codigo_actual))
-                    }
-                )
-            )
-
-        # Usar el método run_with_thread
-        texto = self.run_with_thread(prompt)
+        prompt = _PROMPT_VERIFICACION.format(requerimientos=reqs_formatted, codigo=codigo_str)
+
+        # Registrar las fases de la verificación para publicarlas en un único mensaje al final
+        eventos = [{
+            "phase": "start",
+            "contenido": f"Verificando {len(reqs_list)} requerimientos contra {len(codigo_actual)} líneas de código",
+            "requerimientos_count": len(reqs_list),
+            "codigo_length": codigo_len
+        }]
+
+        # Si el código y los requerimientos no cambiaron desde la última verificación, reutilizar
+        # su respuesta en lugar de repetir la llamada a la API
+        huella = _huella_prompt(prompt)
+        texto = self._verificacion_repetida("codigo", huella, prompt)
+        if texto is None:
+            # Un run fallido devuelve "Error: <estado>", que no es JSON y por tanto no se guarda
+            texto = self.run_with_thread(prompt, **self._run_kwargs())
+            self._recordar_verificacion("codigo", huella, texto)
 
         # El resto del procesamiento queda igual
         # Guardar la salida
@@ -220,57 +601,80 @@ class SME(OpenAIAssistantAgent):
 
         # Intentar extraer el JSON de la respuesta
         try:
-            # Buscar el JSON en la respuesta (puede estar en un bloque de código)
-            json_match = re.search(r'```json\n(.*?)\n```|```(.*?)```|({.*})', texto, re.DOTALL)
-
-            if json_match:
-                json_str = json_match.group(1) or json_match.group(2) or json_match.group(3)
-                data = json.loads(json_str)
+            # Decodificar el JSON de la respuesta (puede estar en un bloque de código)
+            data = _parse_json_response(texto)
 
-                # ... El resto del procesamiento de JSON ...
+            if data is not None:
+                # Actualizar el estado de los requerimientos
+                if "requirements_status" in data:
+                    _apply_requirement_statuses(reqs_list, data["requirements_status"])
 
                 # Verificar si todos los requerimientos están completos
                 todos_completos = data.get("all_complete", False)
 
                 # Notificar resultado si el sistema de mensajería está disponible
-                if self._sistema_mensajeria:
-                    self._sistema_mensajeria.publicar(
-                        Mensaje(
-                            emisor=self.config.name,
-                            tipo="verificacion_completada",
-                            contenido=f"Verificación completada: {'Todos completos' if todos_completos else 'Hay pendientes'}",
-                            metadata={
-                                "todos_completos": todos_completos,
-                                "requirements_status": data.get("requirements_status", [])
-                            }
-                        )
-                    )
+                eventos.append({
+                    "phase": "completed",
+                    "todos_completos": todos_completos,
+                    "requirements_status": data.get("requirements_status", [])
+                })
+                self._publicar_verificacion(
+                    "verificacion_completada",
+                    f"Verificación completada: {'Todos completos' if todos_completos else 'Hay pendientes'}",
+                    eventos
+                )
 
                 return todos_completos
 
             # Si no se pudo extraer el JSON, usar el método anterior
-            return self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto)
+            todos_completos = self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto)
+            eventos.append({"phase": "fallback", "todos_completos": todos_completos})
+            self._publicar_verificacion(
+                "verificacion_completada",
+                f"Verificación completada sin JSON: {'Todos completos' if todos_completos else 'Hay pendientes'}",
+                eventos
+            )
+            return todos_completos
 
         except Exception as e:
             if self.config.verbose:
                 print(f"[{self.config.name}] ⚠️ Error al procesar JSON: {str(e)}. Usando método alternativo.")
 
             # Notificar error si el sistema de mensajería está disponible
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="error_verificacion",
-                        contenido=f"Error al procesar JSON de verificación: {str(e)}",
-                        metadata={
-                            "error": str(e)
-                        }
-                    )
-                )
+            eventos.append({"phase": "error", "error": str(e)})
+            self._publicar_verificacion(
+                "error_verificacion",
+                f"Error al procesar JSON de verificación: {str(e)}",
+                eventos
+            )
 
             # Si falla el procesamiento JSON, recurrir al método anterior
             return self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto)
 
+    def _publicar_verificacion(self, tipo: str, contenido: str, eventos: List[Dict[str, Any]]):
+        """
+        Publica un único mensaje con todas las fases de una verificación.
+
+        Args:
+            tipo: Tipo del mensaje final.
+            contenido: Resumen legible del resultado.
+            eventos: Fases registradas durante la verificación.
+        """
+        if not self._sistema_mensajeria:
+            return
+
+        # Los campos de la última fase se mantienen en el nivel superior, como antes
+        metadata = {k: v for k, v in eventos[-1].items() if k != "phase"}
+        metadata["events"] = eventos
+        self._sistema_mensajeria.publicar(
+            Mensaje(
+                emisor=self.config.name,
+                tipo=tipo,
+                contenido=contenido,
+                metadata=metadata
+            )
+        )
+
     def _create_requirements_from_json(self, data: Dict[str, Any]) -> RequirementsList:
         """
         Crea una lista de requerimientos a partir de datos JSON.
@@ -282,6 +686,7 @@ class SME(OpenAIAssistantAgent):
             RequirementsList: Lista de requerimientos.
         """
         requirements_list = RequirementsList()
+        reqs = []
 
         # Si el JSON tiene una estructura diferente, intentar adaptarla
         if "requirements" in data:
@@ -296,12 +701,12 @@ class SME(OpenAIAssistantAgent):
                 # Si no hay listas, intentar usar el propio diccionario
                 reqs_data = [data]
 
-        # Procesar cada requerimiento
+        # Normalizar cada requerimiento en una primera pasada
         for i, req_data in enumerate(reqs_data):
             try:
                 # Si el requerimiento es una cadena, convertirlo a objeto
                 if isinstance(req_data, str):
-                    req = FunctionalRequirement.from_string(req_data)
+                    reqs.append(FunctionalRequirement.from_string(req_data))
                 else:
                     # Asegurarse de que tenga los campos necesarios
                     if "id" not in req_data:
@@ -313,158 +718,153 @@ class SME(OpenAIAssistantAgent):
                         # Si no hay descripción ni texto, usar el requerimiento completo
                         req_data["description"] = str(req_data)
 
-                    req = FunctionalRequirement(**req_data)
-
-                requirements_list.add_requirement(req)
+                    reqs.append(req_data)
             except Exception as e:
                 if self.config.verbose:
                     print(f"[{self.config.name}] ⚠️ Error al procesar requerimiento: {str(e)}")
 
+        # Validar todos los requerimientos en una sola llamada; si alguno es inválido,
+        # validar uno a uno para descartar solo los erróneos
+        try:
+            reqs = _REQ_LIST_ADAPTER.validate_python(reqs)
+        except ValidationError:
+            validos = []
+            for req_data in reqs:
+                try:
+                    validos.append(_REQ_ADAPTER.validate_python(req_data))
+                except ValidationError as e:
+                    if self.config.verbose:
+                        print(f"[{self.config.name}] ⚠️ Error al procesar requerimiento: {str(e)}")
+            reqs = validos
+
+        # Descartar repeticiones del modelo antes de que lleguen al resto de agentes
+        requirements_list.extend(_deduplicate_requirements(reqs))
         return requirements_list
 
-    def verificar_requerimientos(self, requerimientos_funcionales: Union[List[str], RequirementsList],
-                                 codigo_actual: List[str]) -> bool:
+    async def arun(self, prompt_sme: str) -> RequirementsList:
         """
-        Verifica si todos los requerimientos funcionales están implementados en el código actual.
+        Variante asíncrona de run que ejecuta las llamadas bloqueantes al SDK en un hilo.
 
         Args:
-            requerimientos_funcionales: Lista de requerimientos funcionales a verificar.
-            codigo_actual: Código actual implementado.
+            prompt_sme: Prompt para el agente SME, generalmente la descripción del proyecto.
 
         Returns:
-            bool: True si todos los requerimientos están implementados, False en caso contrario.
+            RequirementsList: Lista estructurada de requerimientos funcionales generados.
         """
-        iteration_id = self._generate_iteration_id()
-
-        # Convertir requerimientos a RequirementsList si es una lista de strings
-        if isinstance(requerimientos_funcionales, list):
-            reqs_list = RequirementsList.from_strings(requerimientos_funcionales)
-        else:
-            reqs_list = requerimientos_funcionales
-
-        # Crear un nuevo thread para esta conversación
-        thread = self.client.beta.threads.create()
+        return await asyncio.to_thread(self.run, prompt_sme)
 
-        # Formatear los requerimientos para el prompt
-        reqs_formatted = "\n".join([f"- {req.id}: {req.description}" for req in reqs_list])
+    async def averificar_requerimientos(self, requerimientos_funcionales: Union[List[str], RequirementsList],
+                                        codigo_actual: Union[List[str], str]) -> bool:
+        """
+        Variante asíncrona de verificar_requerimientos que no bloquea el event loop.
 
-        # Preparar el prompt para la verificación
-        prompt = f"""
-        Evalúa el código desarrollado y determina qué requerimientos se han cumplido y cuáles faltan.
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a verificar.
+            codigo_actual: Código actual implementado.
 
-        Requerimientos originales:
-        {reqs_formatted}
+        Returns:
+            bool: True si todos los requerimientos están implementados, False en caso contrario.
+        """
+        return await asyncio.to_thread(self.verificar_requerimientos, requerimientos_funcionales, codigo_actual)
 
-        Código actual:
-        ```
-        {'\n'.join(codigo_actual)}
-        ```
+    def verificar_requerimientos_batch(self, items: List[Tuple[Union[List[str], RequirementsList],
+                                                                Union[List[str], str]]],
+                                       intervalo: float = 30.0, tiempo_maximo: float = 3600.0) -> List[bool]:
+        """
+        Verifica varios pares (requerimientos, código) en un único trabajo de la Batch API de OpenAI.
 
-        Para cada requerimiento, indica claramente si:
-        1. CUMPLIDO: El requerimiento está completamente implementado
-        2. PARCIAL: El requerimiento está parcialmente implementado (explica qué falta)
-        3. PENDIENTE: El requerimiento no ha sido implementado
+        El trabajo se procesa de forma diferida (ventana de 24h) a la mitad de coste y sin un
+        polling por verificación. Con menos de _MIN_BATCH_ITEMS pares se usa la verificación
+        normal, ya que la latencia del batch no compensa.
 
-        FORMATO DE RESPUESTA:
-        Responde con un análisis del estado de cada requerimiento en formato JSON:
-        {{
-            "requirements_status": [
-                {{
-                    "id": "REQ-01",
-                    "status": "CUMPLIDO|PARCIAL|PENDIENTE",
-                    "analysis": "Análisis detallado de por qué tiene ese estado"
-                }},
-                ...
-            ],
-            "all_complete": true|false
-        }}
+        Args:
+            items: Lista de tuplas (requerimientos_funcionales, codigo_actual).
+            intervalo: Segundos entre consultas del estado del batch.
+            tiempo_maximo: Segundos de espera del batch; pasado este tiempo se cancela y se
+                usa la verificación normal.
 
-        IMPORTANTE: Asegúrate de incluir el campo "all_complete" con el valor true solo si TODOS los requerimientos están CUMPLIDOS.
+        Returns:
+            List[bool]: Para cada par, True si todos los requerimientos están implementados.
         """
+        if len(items) < _MIN_BATCH_ITEMS:
+            return [self.verificar_requerimientos(reqs, codigo) for reqs, codigo in items]
 
-        # Agregar mensaje al thread
-        self.client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=prompt
-        )
-
-        # Ejecutar el asistente en este thread
-        run = self.client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=self.assistant.id
-        )
+        iteration_id = self._generate_iteration_id()
 
-        # Esperar a que termine la ejecución
-        while run.status in ["queued", "in_progress"]:
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=thread.id,
-                run_id=run.id
-            )
+        # Construir una petición /v1/chat/completions por par, en formato JSONL
+        lineas = []
+        for indice, (reqs, codigo) in enumerate(items):
+            reqs_list = _reqs_from_strings(reqs) if isinstance(reqs, list) else reqs
+            reqs_formatted = "\n".join([f"- {req.id}: {req.description}" for req in reqs_list])
+            prompt = _PROMPT_VERIFICACION.format(requerimientos=reqs_formatted, codigo=_unir_codigo(codigo))
+            lineas.append(json.dumps({
+                "custom_id": f"verificacion-{indice}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.config.model,
+                    "messages": [
+                        {"role": "system", "content": self.prompt_template},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "response_format": {"type": "json_object"}
+                }
+            }, ensure_ascii=False))
 
-        # Obtener los mensajes resultantes
-        messages = self.client.beta.threads.messages.list(
-            thread_id=thread.id
+        archivo = self.client.files.create(
+            file=(f"verificacion-{iteration_id}.jsonl", "\n".join(lineas).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=archivo.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
         )
 
-        # Extraer el contenido del último mensaje (respuesta del asistente)
-        assistant_messages = [
-            msg for msg in messages.data
-            if msg.role == "assistant"
-        ]
-
-        if assistant_messages:
-            latest_message = assistant_messages[0]
-            content_parts = [
-                part.text.value for part in latest_message.content
-                if hasattr(part, "text") and hasattr(part.text, "value")
-            ]
-            texto = "\n".join(content_parts)
-
-            # Guardar la salida
-            self._save_output(texto, iteration_id)
-
-            # Intentar extraer el JSON de la respuesta
+        if self.config.verbose:
+            print(f"[{self.config.name}] Batch de verificación {batch.id} enviado con {len(items)} peticiones")
+
+        # Esperar a que el batch termine, como mucho tiempo_maximo segundos
+        limite = time.monotonic() + tiempo_maximo
+        while batch.status in ["validating", "in_progress", "finalizing"]:
+            if time.monotonic() >= limite:
+                print(f"[{self.config.name}] ⚠️ El batch {batch.id} no terminó en {tiempo_maximo:.0f}s; "
+                      f"se usa la verificación normal")
+                try:
+                    self.client.batches.cancel(batch.id)
+                except Exception as e:
+                    print(f"[{self.config.name}] ⚠️ No se pudo cancelar el batch {batch.id}: {str(e)}")
+                return [self.verificar_requerimientos(reqs, codigo) for reqs, codigo in items]
+            time.sleep(min(intervalo, max(limite - time.monotonic(), 0)))
+            batch = self.client.batches.retrieve(batch.id)
+
+        resultados = [False] * len(items)
+        if batch.status != "completed" or not batch.output_file_id:
+            print(f"[{self.config.name}] ⚠️ El batch {batch.id} terminó con estado {batch.status}")
+            return resultados
+
+        # Interpretar cada respuesta por su custom_id
+        salida = self.client.files.content(batch.output_file_id).text
+        for linea in salida.splitlines():
+            if not linea.strip():
+                continue
+            # Una línea mal formada o con error no debe descartar el resto del batch ya pagado
+            indice = None
             try:
-                # Buscar el JSON en la respuesta (puede estar en un bloque de código)
-                json_match = re.search(r'```json\n(.*?)\n```|```(.*?)```|({.*})', texto, re.DOTALL)
-
-                if json_match:
-                    json_str = json_match.group(1) or json_match.group(2) or json_match.group(3)
-                    data = json.loads(json_str)
-
-                    # Actualizar el estado de los requerimientos
-                    if "requirements_status" in data:
-                        for req_status in data["requirements_status"]:
-                            req_id = req_status.get("id")
-                            status = req_status.get("status", "").upper()
-
-                            # Mapear los estados al formato de Pydantic
-                            status_map = {
-                                "CUMPLIDO": "Completo",
-                                "PARCIAL": "Parcial",
-                                "PENDIENTE": "Pendiente"
-                            }
-
-                            # Actualizar el estado en la lista de requerimientos
-                            for req in reqs_list:
-                                if req.id == req_id:
-                                    req.status = status_map.get(status, "Pendiente")
-
-                    # Verificar si todos los requerimientos están completos
-                    return data.get("all_complete", False)
-
-                # Si no se pudo extraer el JSON, usar el método anterior
-                return self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto)
-
+                registro = json.loads(linea)
+                indice = int(registro["custom_id"].rsplit("-", 1)[1])
+                texto = registro["response"]["body"]["choices"][0]["message"]["content"]
+                data = _parse_json_response(texto)
+                if data is not None:
+                    resultados[indice] = data.get("all_complete", False)
+                else:
+                    resultados[indice] = self._confirmar_requerimientos_resueltos(items[indice][0], texto)
             except Exception as e:
                 if self.config.verbose:
-                    print(f"[{self.config.name}] ⚠️ Error al procesar JSON: {str(e)}. Usando método alternativo.")
+                    print(f"[{self.config.name}] ⚠️ Error al procesar la verificación {indice} del batch: {str(e)}")
 
-                # Si falla el procesamiento JSON, recurrir al método anterior
-                return self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto)
-
-        return False
+        self._save_output(salida, f"{iteration_id}-batch")
+        return resultados
 
     def _confirmar_requerimientos_resueltos(self, requerimientos_funcionales: Union[List[str], RequirementsList],
                                             respuesta: str) -> bool:
@@ -483,7 +883,8 @@ class SME(OpenAIAssistantAgent):
             return True
 
         # Verificar si la respuesta indica que todos los requerimientos están completos
-        if "TODOS LOS REQUERIMIENTOS ESTÁN COMPLETOS" in respuesta.upper() or "ALL REQUIREMENTS ARE COMPLETE" in respuesta.upper():
+        respuesta_upper = respuesta.upper()
+        if "TODOS LOS REQUERIMIENTOS ESTÁN COMPLETOS" in respuesta_upper or "ALL REQUIREMENTS ARE COMPLETE" in respuesta_upper:
             return True
 
         # Convertir a lista de strings si es un RequirementsList
@@ -492,25 +893,64 @@ class SME(OpenAIAssistantAgent):
         else:
             reqs_str = requerimientos_funcionales
 
-        # Contar cuántos requerimientos están marcados como completos
-        requerimientos_completos = 0
-        for req in reqs_str:
-            req_id = req.split(":")[0].strip() if ":" in req else req.strip()
-            if (f"{req_id}: COMPLETO" in respuesta or
-                    f"{req_id}: CUMPLIDO" in respuesta or
-                    f"{req_id} - COMPLETO" in respuesta or
-                    f"{req_id} - CUMPLIDO" in respuesta):
-                requerimientos_completos += 1
+        req_ids = [req.split(":")[0].strip() if ":" in req else req.strip() for req in reqs_str]
+        if not req_ids:
+            return True
+
+        # Una respuesta más corta que el marcador más pequeño no puede confirmar ningún requerimiento
+        if len(respuesta) < min(len(req_id) for req_id in req_ids) + len(": COMPLETO"):
+            return False
+
+        # Buscar todos los marcadores "<ID>: COMPLETO", "<ID> - CUMPLIDO", etc. en una sola pasada.
+        # Con IDs estándar REQ-XX basta el patrón precompilado; si no, se compila uno con los IDs.
+        ids_unicos = set(req_ids)
+        if all(_REQ_ID_RE.fullmatch(req_id) for req_id in ids_unicos):
+            patron = _STATUS_RE
+        else:
+            alternativas = sorted(ids_unicos, key=len, reverse=True)
+            patron = re.compile("(" + "|".join(map(re.escape, alternativas)) + r")(?:: | - )(?:COMPLETO|CUMPLIDO)")
+        confirmados = {match.group(1) for match in patron.finditer(respuesta)}
 
         # Si todos los requerimientos están completos, retornar True
-        return requerimientos_completos == len(reqs_str)
+        return all(req_id in confirmados for req_id in req_ids)
 
     def __str__(self):
         return f"{self.config.name}: Generador de requerimientos funcionales"
 
-    # Actualización de la clase SME para revisar código del proyecto
+    def _leer_archivo_proyecto(self, archivo: Path) -> Optional[str]:
+        """
+        Lee un archivo del proyecto truncado a 5000 caracteres, reutilizando la caché
+        si el archivo no cambió desde la última verificación.
 
-    # Método a añadir/actualizar en la clase SME en src/agents/sme.py
+        Args:
+            archivo: Ruta del archivo a leer.
+
+        Returns:
+            El contenido (posiblemente truncado), o None si no se pudo leer.
+        """
+        try:
+            st = archivo.stat()
+            clave = str(archivo)
+            cacheado = self._file_cache.get(clave)
+            if cacheado and cacheado[0] == st.st_mtime_ns and cacheado[1] == st.st_size:
+                return cacheado[2]
+
+            # Omitir sin abrirlos los archivos vacíos y los demasiado grandes (bundles, minificados)
+            if st.st_size == 0 or st.st_size > _MAX_FILE_BYTES:
+                return None
+
+            # Leer como máximo un carácter más del límite para detectar el truncado
+            with open(archivo, "r", encoding="utf-8") as f:
+                contenido = f.read(min(st.st_size, 5001))
+
+            # Limitar el tamaño de los archivos grandes para evitar problemas de contexto
+            if len(contenido) > 5000:
+                contenido = contenido[:5000] + f"\n\n... [Archivo truncado, tamaño original: {st.st_size} bytes]"
+            self._file_cache[clave] = (st.st_mtime_ns, st.st_size, contenido)
+            return contenido
+        except Exception as e:
+            print(f"Error al leer archivo {archivo}: {str(e)}")
+            return None
 
     def verificar_requerimientos_proyecto(self, requerimientos_funcionales, project_path):
         """
@@ -522,15 +962,113 @@ class SME(OpenAIAssistantAgent):
             project_path: Ruta a la carpeta del proyecto.
 
         Returns:
-            bool: True si todos los requerimientos están implementados, False en caso contrario.
-            dict: Diccionario con el estado de cada requerimiento.
+            VerificacionResult: Si todos los requerimientos están implementados y el estado de cada uno.
+        """
+        iteration_id = self._generate_iteration_id()
+        reqs_list, prompt, resultado = self._preparar_verificacion_proyecto(
+            requerimientos_funcionales, project_path, iteration_id)
+        if prompt is None:
+            return resultado
+
+        huella = _huella_prompt(prompt)
+        texto = self._verificacion_repetida("proyecto", huella, prompt)
+        if texto is None:
+            texto, completado = self._ejecutar_verificacion_proyecto(prompt)
+            if not completado:
+                return VerificacionResult(False, motivo="run_fallido")
+            self._recordar_verificacion("proyecto", huella, texto)
+        return self._procesar_verificacion_proyecto(texto, reqs_list, requerimientos_funcionales, iteration_id)
+
+    async def averificar_requerimientos_proyecto(self, requerimientos_funcionales, project_path):
+        """
+        Variante asíncrona de verificar_requerimientos_proyecto.
+
+        La lectura del proyecto se hace en un hilo y la espera del run usa el cliente
+        asíncrono de OpenAI, de modo que otros agentes pueden avanzar mientras tanto.
+
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a verificar.
+            project_path: Ruta a la carpeta del proyecto.
+
+        Returns:
+            VerificacionResult: Si todos los requerimientos están implementados y el estado de cada uno.
         """
         iteration_id = self._generate_iteration_id()
+        reqs_list, prompt, resultado = await asyncio.to_thread(
+            self._preparar_verificacion_proyecto, requerimientos_funcionales, project_path, iteration_id)
+        if prompt is None:
+            return resultado
+
+        huella = _huella_prompt(prompt)
+        texto = self._verificacion_repetida("proyecto", huella, prompt)
+        if texto is None:
+            texto, completado = await self._aejecutar_verificacion_proyecto(prompt)
+            if not completado:
+                return VerificacionResult(False, motivo="run_fallido")
+            self._recordar_verificacion("proyecto", huella, texto)
+        return self._procesar_verificacion_proyecto(texto, reqs_list, requerimientos_funcionales, iteration_id)
+
+    def _recordar_verificacion(self, tipo: str, huella: str, texto: Optional[str]) -> None:
+        """
+        Guarda una respuesta de verificación para reutilizarla si el prompt se repite.
+
+        Solo se guardan respuestas con un JSON válido: un error o una respuesta vacía o ilegible
+        se repetiría en cada iteración sin cambios en lugar de volver a intentarse.
 
+        Args:
+            tipo: Tipo de verificación ("proyecto" o "codigo"); cada uno tiene su propia entrada.
+            huella: Hash del prompt de verificación.
+            texto: Respuesta del asistente.
+        """
+        if texto and _parse_json_response(texto) is not None:
+            self._ultimas_verificaciones[tipo] = (huella, texto)
+
+    def _verificacion_repetida(self, tipo: str, huella: str, prompt: str) -> Optional[str]:
+        """
+        Devuelve la respuesta de la verificación anterior del mismo tipo si su prompt era idéntico.
+
+        Args:
+            tipo: Tipo de verificación ("proyecto" o "codigo").
+            huella: Hash del prompt de verificación actual.
+            prompt: Prompt de verificación, para estimar los tokens ahorrados.
+
+        Returns:
+            La respuesta anterior, o None si el código o los requerimientos cambiaron.
+        """
+        anterior = self._ultimas_verificaciones.get(tipo)
+        if anterior is None or anterior[0] != huella:
+            return None
+        texto = anterior[1]
+
+        tokens_saved = estimar_tokens(prompt) + estimar_tokens(texto)
+        if self.config.verbose:
+            print(f"[{self.config.name}] Sin cambios desde la última verificación ({tipo}); se reutiliza el resultado")
+        self._notificar(
+            "cache_hit",
+            f"Verificación ({tipo}) reutilizada: sin cambios desde la anterior",
+            lambda: {
+                "modelo": self.config.model,
+                "tokens_saved": tokens_saved
+            }
+        )
+        return texto
+
+    def _preparar_verificacion_proyecto(self, requerimientos_funcionales, project_path, iteration_id):
+        """
+        Recolecta los archivos del proyecto y construye el prompt de verificación.
+
+        Args:
+            requerimientos_funcionales: Lista de requerimientos funcionales a verificar.
+            project_path: Ruta a la carpeta del proyecto.
+            iteration_id: Identificador de la iteración actual.
+
+        Returns:
+            Tupla (reqs_list, prompt, resultado). Si no hay nada que verificar, prompt es
+            None y resultado contiene el VerificacionResult a devolver.
+        """
         # Convertir requerimientos a RequirementsList si es una lista de strings
         if isinstance(requerimientos_funcionales, list):
-            from src.core.models import RequirementsList, FunctionalRequirement
-            reqs_list = RequirementsList.from_strings(requerimientos_funcionales)
+            reqs_list = _reqs_from_strings(requerimientos_funcionales)
         else:
             reqs_list = requerimientos_funcionales
 
@@ -539,86 +1077,73 @@ class SME(OpenAIAssistantAgent):
             error_msg = f"La carpeta del proyecto no existe: {project_path}"
             print(f"[{self.config.name}] ⚠️ {error_msg}")
             self._save_output(error_msg, iteration_id)
-            return False, {}
+            return reqs_list, None, VerificacionResult(False, motivo="missing_project")
 
         # Recolectar archivos importantes del proyecto
-        archivos_codigo = []
         project_path = Path(project_path)
 
-        # Crear un resumen de la estructura del proyecto
-        estructura_proyecto = ["# Estructura del proyecto"]
-        estructura_proyecto.append(f"\nCarpeta raíz: {project_path}")
-
-        # Listar directorios principales
-        estructura_proyecto.append("\n## Directorios principales:")
-        for item in project_path.iterdir():
-            if item.is_dir():
-                estructura_proyecto.append(f"- {item.name}/")
-
-        # Extensiones de archivos relevantes para revisión
-        extensiones_codigo = ['.js', '.jsx', '.ts', '.tsx', '.py', '.html', '.css', '.php', '.java', '.go', '.rb']
-
         # Recolectar archivos de código por tipo
         archivos_frontend = []
         archivos_backend = []
         archivos_config = []
 
-        # Función para determinar la categoría de un archivo
-        def categorizar_archivo(ruta):
-            if "frontend" in str(ruta) or "client" in str(ruta) or "public" in str(ruta):
-                return "frontend"
-            elif "backend" in str(ruta) or "server" in str(ruta) or "api" in str(ruta):
-                return "backend"
+        # Buscar recursivamente todos los archivos de código en un único recorrido
+        # El primer nivel del recorrido también da los directorios principales para la estructura
+        candidatos = []
+        directorios_principales = None
+        # Orden alfabético en cada nivel: os.walk devuelve el orden del sistema de archivos, que puede
+        # variar entre ejecuciones; un orden estable deja el prompt idéntico si el proyecto no cambia
+        # (prefijo cacheable por el proveedor y huella de _verificacion_repetida)
+        for dirpath, dirnames, filenames in os.walk(project_path):
+            dirnames.sort()
+            if directorios_principales is None:
+                directorios_principales = list(dirnames)
+            # Podar in situ para que os.walk no descienda a los directorios excluidos
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS]
+            for nombre in sorted(filenames):
+                if os.path.splitext(nombre)[1].lower() in _CODE_EXTS:
+                    candidatos.append(Path(dirpath) / nombre)
+
+        # Leer los archivos en paralelo: el trabajo está limitado por la latencia de E/S
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            contenidos = list(executor.map(self._leer_archivo_proyecto, candidatos))
+
+        for archivo, contenido in zip(candidatos, contenidos):
+            if contenido is None:
+                continue
+
+            categoria = _categorize(str(archivo), archivo.suffix.lower())
+            ruta_relativa = archivo.relative_to(project_path)
+
+            # Agregar a la categoría correspondiente
+            if categoria == "frontend":
+                archivos_frontend.append((str(ruta_relativa), contenido))
+            elif categoria == "backend":
+                archivos_backend.append((str(ruta_relativa), contenido))
             else:
-                # Por extensión
-                ext = ruta.suffix.lower()
-                if ext in ['.js', '.jsx', '.ts', '.tsx', '.html', '.css', '.vue', '.svelte']:
-                    return "frontend"
-                elif ext in ['.py', '.java', '.php', '.go', '.rb']:
-                    return "backend"
-                else:
-                    return "config"
-
-        # Buscar recursivamente todos los archivos de código
-        for ext in extensiones_codigo:
-            for archivo in project_path.glob(f"**/*{ext}"):
-                if archivo.is_file() and not any(
-                        exclude in str(archivo) for exclude in ["node_modules", "__pycache__", ".git"]):
-                    categoria = categorizar_archivo(archivo)
-                    ruta_relativa = archivo.relative_to(project_path)
-
-                    try:
-                        with open(archivo, "r", encoding="utf-8") as f:
-                            contenido = f.read()
-
-                        # Limitar el tamaño de los archivos grandes para evitar problemas de contexto
-                        if len(contenido) > 5000:
-                            contenido = contenido[
-                                        :5000] + f"\n\n... [Archivo truncado, tamaño original: {len(contenido)} caracteres]"
-
-                        # Agregar a la categoría correspondiente
-                        if categoria == "frontend":
-                            archivos_frontend.append((str(ruta_relativa), contenido))
-                        elif categoria == "backend":
-                            archivos_backend.append((str(ruta_relativa), contenido))
-                        else:
-                            archivos_config.append((str(ruta_relativa), contenido))
-
-                    except Exception as e:
-                        print(f"Error al leer archivo {archivo}: {str(e)}")
+                archivos_config.append((str(ruta_relativa), contenido))
+
+        # Sin archivos de código no hay nada que verificar: evitar el thread y la llamada al asistente
+        if not (archivos_frontend or archivos_backend or archivos_config):
+            aviso = f"No se encontraron archivos de código en el proyecto: {project_path}"
+            print(f"[{self.config.name}] ⚠️ {aviso}")
+            self._save_output(aviso, iteration_id)
+            return reqs_list, None, VerificacionResult(False, motivo="empty_project")
+
+        # Crear un resumen de la estructura del proyecto a partir del mismo recorrido
+        estructura_proyecto = ["# Estructura del proyecto", f"\nCarpeta raíz: {project_path}"]
+        estructura_proyecto.append("\n## Directorios principales:")
+        estructura_proyecto.extend(f"- {nombre}/" for nombre in directorios_principales or [])
 
         # Agregar información sobre archivos encontrados a la estructura
         estructura_proyecto.append(f"\n## Frontend ({len(archivos_frontend)} archivos):")
-        for ruta, _ in archivos_frontend:
-            estructura_proyecto.append(f"- {ruta}")
+        estructura_proyecto.extend(f"- {ruta}" for ruta, _ in archivos_frontend)
 
         estructura_proyecto.append(f"\n## Backend ({len(archivos_backend)} archivos):")
-        for ruta, _ in archivos_backend:
-            estructura_proyecto.append(f"- {ruta}")
+        estructura_proyecto.extend(f"- {ruta}" for ruta, _ in archivos_backend)
 
         estructura_proyecto.append(f"\n## Configuración y otros ({len(archivos_config)} archivos):")
-        for ruta, _ in archivos_config:
-            estructura_proyecto.append(f"- {ruta}")
+        estructura_proyecto.extend(f"- {ruta}" for ruta, _ in archivos_config)
 
         # Formatear los archivos para el prompt - seleccionar los más importantes
         archivos_para_prompt = []
@@ -649,62 +1174,76 @@ class SME(OpenAIAssistantAgent):
         archivos_para_prompt.extend(backend_principales)
         archivos_para_prompt.extend(config_principales)
 
-        # Crear un nuevo thread para esta conversación
-        thread = self.client.beta.threads.create()
-
         # Formatear los requerimientos para el prompt
         reqs_formatted = "\n".join([f"- {req.id}: {req.description}" for req in reqs_list])
 
-        # Formato para mostrar los archivos
-        archivos_texto = []
-        for ruta, contenido in archivos_para_prompt:
+        # Formato para mostrar los archivos, escrito directamente en un único buffer
+        buffer_archivos = io.StringIO()
+        for indice, (ruta, contenido) in enumerate(archivos_para_prompt):
             extension = ruta.split('.')[-1] if '.' in ruta else ""
-            archivos_texto.append(f"\n### {ruta}")
-            archivos_texto.append(f"```{extension}")
-            archivos_texto.append(contenido)
-            archivos_texto.append("```")
+            if indice:
+                buffer_archivos.write("\n")
+            buffer_archivos.write(f"\n### {ruta}\n```{extension}\n")
+            buffer_archivos.write(contenido)
+            buffer_archivos.write("\n```")
 
-        archivos_texto_str = "\n".join(archivos_texto)
+        archivos_texto_str = buffer_archivos.getvalue()
         estructura_proyecto_str = "\n".join(estructura_proyecto)
 
         # Preparar el prompt para la verificación
-        prompt = f"""
-        Evalúa el código del proyecto para determinar qué requerimientos se han cumplido y cuáles faltan.
+        prompt = _PROMPT_VERIFICACION_PROYECTO.format(
+            requerimientos=reqs_formatted,
+            estructura=estructura_proyecto_str,
+            archivos=archivos_texto_str
+        )
 
-        Requerimientos funcionales a verificar:
-        {reqs_formatted}
+        return reqs_list, prompt, None
 
-        {estructura_proyecto_str}
+    def _run_kwargs(self) -> Dict[str, Any]:
+        """Argumentos adicionales para runs.create según la configuración del agente."""
+        if self.config.response_format:
+            return {"response_format": self.config.response_format}
+        return {}
 
-        Código del proyecto (archivos principales):
-        {archivos_texto_str}
+    def reiniciar_thread_verificacion(self):
+        """
+        Descarta el thread de verificación; la siguiente verificación del proyecto empieza uno nuevo.
+        """
+        self._verify_thread = None
+        self._tokens_verify_thread = 0
 
-        TAREAS:
-        1. Analiza cada requerimiento y determina su estado actual.
-        2. Para cada requerimiento, indica claramente si está:
-           - CUMPLIDO: El requerimiento está completamente implementado
-           - PARCIAL: El requerimiento está parcialmente implementado (explica qué falta)
-           - PENDIENTE: El requerimiento no ha sido implementado
-        3. Proporciona evidencia específica en el código para justificar tu evaluación.
+    def _limitar_thread_verificacion(self, tokens_prompt: int):
+        """
+        Reinicia el thread de verificación si el siguiente prompt haría superar el presupuesto de tokens.
 
-        FORMATO DE RESPUESTA:
-        Responde con un análisis del estado de cada requerimiento en formato JSON:
-        {{
-            "requirements_status": [
-                {{
-                    "id": "REQ-01",
-                    "status": "CUMPLIDO|PARCIAL|PENDIENTE",
-                    "evidence": "Explicación detallada con referencias al código",
-                    "missing": "Lo que falta por implementar (si aplica)"
-                }},
-                ...
-            ],
-            "all_complete": true|false,
-            "summary": "Resumen general del estado del proyecto"
-        }}
+        Args:
+            tokens_prompt: Tokens estimados del prompt que se va a enviar.
+        """
+        if self._verify_thread is None:
+            return
+        if self._tokens_verify_thread + tokens_prompt > _MAX_TOKENS_THREAD_VERIFICACION:
+            if self.config.verbose:
+                print(f"[{self.config.name}] Thread de verificación con ~{self._tokens_verify_thread} tokens; "
+                      f"se inicia uno nuevo")
+            self.reiniciar_thread_verificacion()
 
-        IMPORTANTE: Busca evidencia concreta en el código. Si un archivo no está en la lista pero es mencionado en otros archivos, asume que existe.
+    def _ejecutar_verificacion_proyecto(self, prompt: str) -> Tuple[Optional[str], bool]:
         """
+        Envía el prompt al thread de verificación y recibe la respuesta del asistente en streaming.
+
+        Args:
+            prompt: Prompt de verificación.
+
+        Returns:
+            Tupla (texto de la respuesta o None si el asistente no respondió,
+            True si el run terminó en estado completed).
+        """
+        # Reutilizar el thread de verificación entre iteraciones mientras no supere el presupuesto
+        tokens_prompt = estimar_tokens(prompt)
+        self._limitar_thread_verificacion(tokens_prompt)
+        if self._verify_thread is None:
+            self._verify_thread = self.client.beta.threads.create()
+        thread = self._verify_thread
 
         # Agregar mensaje al thread
         self.client.beta.threads.messages.create(
@@ -713,108 +1252,159 @@ class SME(OpenAIAssistantAgent):
             content=prompt
         )
 
-        # Ejecutar el asistente en este thread
-        run = self.client.beta.threads.runs.create(
+        # Ejecutar el asistente en streaming: el texto llega a medida que se genera, sin
+        # consultar el estado del run ni descargar los mensajes al terminar.
+        # Con response_format el modelo responde JSON directamente.
+        self._limitador.acquire(tokens_prompt)
+        partes = []
+        with self.client.beta.threads.runs.stream(
             thread_id=thread.id,
-            assistant_id=self.assistant.id
-        )
+            assistant_id=self.assistant.id,
+            **self._run_kwargs()
+        ) as stream:
+            for delta in stream.text_deltas:
+                partes.append(delta)
+            run = stream.get_final_run()
+
+        # Un run fallido, cancelado o expirado puede haber dejado texto parcial: no es un veredicto
+        texto = "".join(partes) or None
+        self._tokens_verify_thread += tokens_prompt + (estimar_tokens(texto) if texto else 0)
+        self._registrar_resultado_run(run)
+        if run.status != "completed":
+            print(f"[{self.config.name}] ⚠️ La verificación del proyecto terminó con estado: {run.status}")
+        return texto, run.status == "completed"
+
+    async def _aejecutar_verificacion_proyecto(self, prompt: str) -> Tuple[Optional[str], bool]:
+        """
+        Variante asíncrona de _ejecutar_verificacion_proyecto con el cliente asíncrono.
 
-        # Esperar a que termine la ejecución
-        while run.status in ["queued", "in_progress"]:
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=thread.id,
-                run_id=run.id
-            )
+        Args:
+            prompt: Prompt de verificación.
 
-        # Obtener los mensajes resultantes
-        messages = self.client.beta.threads.messages.list(
-            thread_id=thread.id
+        Returns:
+            Tupla (texto de la respuesta o None, True si el run terminó en estado completed).
+        """
+        # Reutilizar el thread de verificación entre iteraciones mientras no supere el presupuesto
+        tokens_prompt = estimar_tokens(prompt)
+        self._limitar_thread_verificacion(tokens_prompt)
+        if self._verify_thread is None:
+            self._verify_thread = await self.async_client.beta.threads.create()
+        thread = self._verify_thread
+
+        # Agregar mensaje al thread
+        await self.async_client.beta.threads.messages.create(
+            thread_id=thread.id,
+            role="user",
+            content=prompt
         )
 
-        # Extraer el contenido del último mensaje (respuesta del asistente)
-        assistant_messages = [
-            msg for msg in messages.data
-            if msg.role == "assistant"
-        ]
-
-        if assistant_messages:
-            latest_message = assistant_messages[0]
-            content_parts = [
-                part.text.value for part in latest_message.content
-                if hasattr(part, "text") and hasattr(part.text, "value")
-            ]
-            texto = "\n".join(content_parts)
+        # Ejecutar el asistente en streaming (ver _ejecutar_verificacion_proyecto)
+        await self._limitador.aacquire(tokens_prompt)
+        partes = []
+        async with self.async_client.beta.threads.runs.stream(
+            thread_id=thread.id,
+            assistant_id=self.assistant.id,
+            **self._run_kwargs()
+        ) as stream:
+            async for delta in stream.text_deltas:
+                partes.append(delta)
+            run = await stream.get_final_run()
+
+        texto = "".join(partes) or None
+        self._tokens_verify_thread += tokens_prompt + (estimar_tokens(texto) if texto else 0)
+        self._registrar_resultado_run(run)
+        if run.status != "completed":
+            print(f"[{self.config.name}] ⚠️ La verificación del proyecto terminó con estado: {run.status}")
+        return texto, run.status == "completed"
+
+    def _procesar_verificacion_proyecto(self, texto: Optional[str], reqs_list, requerimientos_funcionales,
+                                        iteration_id: str):
+        """
+        Interpreta la respuesta de verificación, actualiza estados y guarda el resumen detallado.
 
-            # Guardar la salida
-            self._save_output(texto, f"{iteration_id}-verificacion")
+        Args:
+            texto: Respuesta del asistente, o None si no hubo respuesta.
+            reqs_list: Requerimientos a actualizar.
+            requerimientos_funcionales: Requerimientos originales para el método alternativo.
+            iteration_id: Identificador de la iteración actual.
 
-            # Intentar extraer el JSON de la respuesta
-            try:
-                # Buscar el JSON en la respuesta (puede estar en un bloque de código)
-                json_match = re.search(r'```json\n(.*?)\n```|```(.*?)```|({.*})', texto, re.DOTALL)
-
-                if json_match:
-                    json_str = json_match.group(1) or json_match.group(2) or json_match.group(3)
-                    data = json.loads(json_str)
-
-                    # Actualizar el estado de los requerimientos
-                    if "requirements_status" in data:
-                        for req_status in data["requirements_status"]:
-                            req_id = req_status.get("id")
-                            status = req_status.get("status", "").upper()
-
-                            # Mapear los estados al formato de Pydantic
-                            status_map = {
-                                "CUMPLIDO": "Completo",
-                                "PARCIAL": "Parcial",
-                                "PENDIENTE": "Pendiente"
-                            }
-
-                            # Actualizar el estado en la lista de requerimientos
-                            for req in reqs_list:
-                                if req.id == req_id:
-                                    req.status = status_map.get(status, "Pendiente")
-
-                    # Crear un resumen detallado para guardar
-                    resumen_detallado = ["# Verificación de Requerimientos", ""]
-                    resumen_detallado.append(f"## Resumen")
-                    resumen_detallado.append(data.get("summary", "No disponible"))
-                    resumen_detallado.append("")
-                    resumen_detallado.append(f"## Estado de los Requerimientos")
-
-                    for req_status in data.get("requirements_status", []):
-                        req_id = req_status.get("id", "Sin ID")
-                        status = req_status.get("status", "Desconocido")
-                        evidence = req_status.get("evidence", "No proporcionada")
-                        missing = req_status.get("missing", "Nada")
-
-                        resumen_detallado.append(f"### {req_id}: {status}")
-                        resumen_detallado.append(f"**Evidencia:** {evidence}")
-                        if status.upper() != "CUMPLIDO" and missing:
-                            resumen_detallado.append(f"**Pendiente:** {missing}")
-                        resumen_detallado.append("")
-
-                    # Guardar el resumen detallado
-                    resumen_path = Path(self.config.output_dir) / f"verificacion-{iteration_id}.md"
-                    with open(resumen_path, "w", encoding="utf-8") as f:
-                        f.write("\n".join(resumen_detallado))
-
-                    print(f"[{self.config.name}] ✅ Verificación detallada guardada en: {resumen_path}")
-
-                    # Verificar si todos los requerimientos están completos
-                    todos_completos = data.get("all_complete", False)
-                    return todos_completos, data.get("requirements_status", {})
+        Returns:
+            VerificacionResult: Si todos los requerimientos están implementados y el estado de cada uno.
+        """
+        if texto is None:
+            return VerificacionResult(False, motivo="no_response")
+
+        # Guardar la salida
+        self._save_output(texto, f"{iteration_id}-verificacion")
+
+        # Intentar extraer el JSON de la respuesta
+        try:
+            # Decodificar el JSON de la respuesta (puede estar en un bloque de código)
+            data = _parse_json_response(texto)
 
+            if data is None:
                 # Si no se pudo extraer el JSON, recurrir al método anterior
-                return self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto), {}
+                return VerificacionResult(self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto))
+
+            # Actualizar el estado de los requerimientos
+            if "requirements_status" in data:
+                _apply_requirement_statuses(reqs_list, data["requirements_status"])
+
+            # Crear un resumen detallado para guardar, escrito en un único buffer
+            resumen_detallado = io.StringIO()
+            w = resumen_detallado.write
+            w("# Verificación de Requerimientos\n\n## Resumen\n")
+            w(data.get("summary", "No disponible"))
+            w("\n\n## Estado de los Requerimientos")
+
+            for req_status in data.get("requirements_status", []):
+                req_id = req_status.get("id", "Sin ID")
+                status = req_status.get("status", "Desconocido")
+                evidence = req_status.get("evidence", "No proporcionada")
+                missing = req_status.get("missing", "Nada")
+
+                w(f"\n### {req_id}: {status}\n**Evidencia:** {evidence}")
+                if status.upper() != "CUMPLIDO" and missing:
+                    w(f"\n**Pendiente:** {missing}")
+                w("\n")
+
+            # Verificar si todos los requerimientos están completos
+            resultado = VerificacionResult(data.get("all_complete", False),
+                                           tuple(data.get("requirements_status", ())))
 
-            except Exception as e:
-                print(f"[{self.config.name}] ⚠️ Error al procesar JSON: {str(e)}. Usando método alternativo.")
+        except Exception as e:
+            print(f"[{self.config.name}] ⚠️ Error al procesar JSON: {str(e)}. Usando método alternativo.")
 
-                # Si falla el procesamiento JSON, recurrir al método anterior
-                return self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto), {}
+            # Si falla el procesamiento JSON, recurrir al método anterior
+            return VerificacionResult(self._confirmar_requerimientos_resueltos(requerimientos_funcionales, texto))
 
-        return False, {}
+        # El resumen se guarda fuera del bloque anterior: un fallo de escritura no debe
+        # reemplazar un veredicto ya interpretado por el método alternativo
+        self._guardar_resumen_verificacion(resumen_detallado.getvalue(), iteration_id)
+        return resultado
+
+    def _guardar_resumen_verificacion(self, contenido: str, iteration_id: str) -> None:
+        """
+        Guarda el resumen detallado de una verificación de forma atómica, si las salidas están activadas.
+
+        Args:
+            contenido: Resumen en Markdown.
+            iteration_id: Identificador de la iteración actual.
+        """
+        if not self.config.save_outputs:
+            return
+
+        # Escribir a un temporal y reemplazar, para no dejar nunca un resumen a medias
+        resumen_path = Path(self.config.output_dir) / f"verificacion-{iteration_id}.md"
+        resumen_tmp = resumen_path.with_suffix(resumen_path.suffix + ".tmp")
+        try:
+            resumen_tmp.write_text(contenido, encoding="utf-8")
+            os.replace(resumen_tmp, resumen_path)
+        except OSError as e:
+            print(f"[{self.config.name}] ⚠️ No se pudo guardar la verificación detallada: {str(e)}")
+            return
+
+        print(f"[{self.config.name}] ✅ Verificación detallada guardada en: {resumen_path}")
 
     def inicializar_mensajeria(self):
         """Configura el sistema de mensajería para este agente."""
@@ -847,23 +1437,14 @@ class SME(OpenAIAssistantAgent):
         contenido = mensaje.contenido
 
         # Intentar identificar qué requerimiento se solicita
-        req_match = re.search(r'REQ-\d+', contenido)
+        req_match = _REQ_ID_RE.search(contenido)
         req_id = req_match.group(0) if req_match else None
 
-        prompt = f"""
-        Se solicita una aclaración sobre {'el requerimiento ' + req_id if req_id else 'los requerimientos'}.
-
-        Consulta: {contenido}
-
-        Proporciona una explicación detallada {'de este requerimiento' if req_id else 'de los requerimientos relevantes'}, 
-        incluyendo:
-        1. Qué funcionalidad debe implementarse exactamente
-        2. Criterios de aceptación
-        3. Consideraciones técnicas importantes
-        4. Posibles desafíos de implementación
-
-        Responde de manera clara y concisa, pero completa.
-        """
+        prompt = _PROMPT_ACLARACION.format(
+            objetivo='el requerimiento ' + req_id if req_id else 'los requerimientos',
+            consulta=contenido,
+            alcance='de este requerimiento' if req_id else 'de los requerimientos relevantes'
+        )
 
         respuesta = self.run(prompt)
 
@@ -886,33 +1467,48 @@ class SME(OpenAIAssistantAgent):
 
     def verificar_implementacion(self, mensaje):
         """Verifica si una implementación cumple con los requerimientos."""
-        contenido = mensaje.contenido
+        return self.run(self._prompt_verificacion_implementacion(mensaje.contenido))
+
+    def _prompt_verificacion_implementacion(self, contenido: str) -> str:
+        """
+        Construye el prompt para verificar el código o la consulta incluidos en un mensaje.
+
+        Args:
+            contenido: Contenido del mensaje, con el código en un bloque ``` si lo hay.
 
-        # Extraer código o referencia a archivos si está presente
-        codigo_bloque = re.search(r'```[\w]*\n(.*?)```', contenido, re.DOTALL)
-        codigo = codigo_bloque.group(1) if codigo_bloque else ""
+        Returns:
+            Prompt de verificación de la implementación.
+        """
+        # Extraer código o referencia a archivos si está presente; la regex solo se aplica
+        # desde el primer ``` y sobre un tramo acotado del mensaje
+        codigo = ""
+        inicio_bloque = contenido.find("```")
+        if inicio_bloque != -1:
+            codigo_bloque = _CODE_BLOCK_RE.search(contenido, inicio_bloque, inicio_bloque + _MAX_CODE_BLOCK_CHARS)
+            codigo = codigo_bloque.group(1) if codigo_bloque else ""
 
         # Extraer requerimientos mencionados
-        reqs_match = re.findall(r'REQ-\d+', contenido)
+        reqs_match = _REQ_ID_RE.findall(contenido)
         reqs_mencionados = list(set(reqs_match))  # Eliminar duplicados
 
-        prompt = f"""
-        Se solicita verificar la implementación de código proporcionada.
-
-        {'Requerimientos mencionados: ' + ', '.join(reqs_mencionados) if reqs_mencionados else 'No se especificaron requerimientos particulares.'}
-
-        {'Código a verificar:' if codigo else 'No se proporcionó código explícito, analiza la consulta:'}
-        {codigo if codigo else contenido}
+        return _PROMPT_VERIFICACION_IMPLEMENTACION.format(
+            requerimientos=('Requerimientos mencionados: ' + ', '.join(reqs_mencionados)
+                            if reqs_mencionados else 'No se especificaron requerimientos particulares.'),
+            encabezado='Código a verificar:' if codigo else 'No se proporcionó código explícito, analiza la consulta:',
+            codigo=codigo if codigo else contenido
+        )
 
-        Evalúa si la implementación cumple con los requerimientos. Incluye:
-        1. Análisis de qué requisitos se cumplen y cuáles no
-        2. Problemas o deficiencias en la implementación
-        3. Sugerencias para mejorar o completar la implementación
+    async def amanejar_consulta(self, mensaje):
+        """Variante asíncrona de manejar_consulta para poder atender varias consultas con asyncio.gather."""
+        return await asyncio.to_thread(self.manejar_consulta, mensaje)
 
-        Sé específico y detallado en tu análisis.
-        """
+    async def aaclarar_requerimiento(self, mensaje):
+        """Variante asíncrona de aclarar_requerimiento."""
+        return await asyncio.to_thread(self.aclarar_requerimiento, mensaje)
 
-        return self.run(prompt)
+    async def averificar_implementacion(self, mensaje):
+        """Variante asíncrona de verificar_implementacion."""
+        return await asyncio.to_thread(self.verificar_implementacion, mensaje)
 
     def solicitar_diseno(self, requerimiento, arquitecto_nombre):
         """
@@ -951,24 +1547,39 @@ class SME(OpenAIAssistantAgent):
         Returns:
             Resultado de la verificación y, si se solicitó, respuesta del desarrollador
         """
-        # Verificar el código
-        verificacion = self.verificar_implementacion(
-            Mensaje(
-                emisor="interno",
-                tipo="verificar_implementacion",
-                contenido=f"""
-                Verifica si este código cumple con los siguientes requerimientos:
-
-                REQUERIMIENTOS:
-                {requerimientos}
-
-                CÓDIGO:
-                ```
-                {codigo}
-                ```
-                """
-            )
-        )
+        # Reutilizar la verificación si el código y los requerimientos no cambiaron; la clave se
+        # construye con el texto que se envía, y la caché guarda el análisis (str, inmutable)
+        reqs_texto = _texto_requerimientos(requerimientos)
+        clave = hashlib.sha256(json.dumps(
+            {"model": self.config.model, "code": codigo, "reqs": reqs_texto},
+            sort_keys=True, default=str
+        ).encode("utf-8")).hexdigest()
+        with self._verificaciones_lock:
+            verificacion = self._verificaciones_cache.get(clave)
+            if verificacion is not None:
+                self._verificaciones_cache.move_to_end(clave)
+
+        if verificacion is None:
+            # Verificar el código con un thread propio y devolver el texto del análisis: a diferencia
+            # de self.run, no modifica self.requirements_list, así que es seguro en paralelo
+            prompt = self._prompt_verificacion_implementacion(f"""
+                    Verifica si este código cumple con los siguientes requerimientos:
+
+                    REQUERIMIENTOS:
+                    {reqs_texto}
+
+                    CÓDIGO:
+                    ```
+                    {codigo}
+                    ```
+                    """)
+            verificacion = self.run_with_thread(prompt)
+            # Un run fallido devuelve "Error: <estado>"; no se guarda para volver a intentarlo
+            if not verificacion.startswith("Error:"):
+                with self._verificaciones_lock:
+                    self._verificaciones_cache[clave] = verificacion
+                    if len(self._verificaciones_cache) > _MAX_VERIFICACIONES_CACHE:
+                        self._verificaciones_cache.popitem(last=False)
 
         # Si hay un desarrollador especificado y se detectaron problemas, solicitar mejoras
         if developer_nombre and "no cumple" in verificacion.lower():
@@ -997,4 +1608,31 @@ class SME(OpenAIAssistantAgent):
         return {
             "verificacion": verificacion,
             "mejoras_solicitadas": False
-        }
\ No newline at end of file
+        }
+
+    async def averificar_codigo_requerimientos_batch(self, items: List[Tuple[Any, Any]],
+                                                     developer_nombre=None) -> List[Any]:
+        """
+        Ejecuta varias verificaciones de código en paralelo, limitando las llamadas simultáneas
+        con un semáforo de config.max_parallel.
+
+        Args:
+            items: Lista de tuplas (codigo, requerimientos).
+            developer_nombre: Nombre del agente desarrollador (opcional).
+
+        Returns:
+            Lista con el resultado de cada verificación (o la excepción producida), en el mismo orden.
+        """
+        # Semáforo local a la llamada: un asyncio.Semaphore queda ligado al event loop en el que
+        # se usa, y guardarlo en la instancia rompería las llamadas desde otro asyncio.run
+        sem = asyncio.Semaphore(self.config.max_parallel)
+
+        async def verificar(codigo, requerimientos):
+            async with sem:
+                return await asyncio.to_thread(
+                    self.verificar_codigo_requerimientos, codigo, requerimientos, developer_nombre)
+
+        return await asyncio.gather(
+            *(verificar(codigo, requerimientos) for codigo, requerimientos in items),
+            return_exceptions=True
+        )
@@ -1,25 +1,215 @@
 # Actualización de src/core/agent.py para incluir mensajería
 from abc import ABC, abstractmethod
+import asyncio
+import hashlib
+import json
+import threading
 import time
-from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
 from pathlib import Path
 import os
-from typing import Optional, Dict, Any, List, Union
+import string
+import sys
+import textwrap
+from typing import Callable, Optional, Dict, Any, List, Set, Tuple, Union
 from src.core.config import AgentConfig
 from src.core.messaging import SistemaMensajeria, Mensaje
-from openai import OpenAI
+from src.core.llm_cache import clave_cache, obtener_cache
+from src.core.throttle import estimar_tokens, obtener_limitador
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 
 try:
-    from anthropic import Anthropic
+    import h2  # noqa: F401
 
-    ANTHROPIC_AVAILABLE = True
+    H2_AVAILABLE = True
 except ImportError:
-    ANTHROPIC_AVAILABLE = False
+    H2_AVAILABLE = False
+
+# Conexiones HTTP reutilizables por cliente compartido; keep-alive largo entre iteraciones del pipeline
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=90)
+# Con h2 instalado, las peticiones concurrentes de un cliente se multiplexan en una sola conexión HTTP/2
+_HTTP_OPCIONES = {"limits": _HTTP_LIMITS, "http2": H2_AVAILABLE}
+
+# Archivo donde se recuerdan los IDs de asistentes entre ejecuciones, agrupados por hash de la clave de API
+_ASSISTANT_CACHE_PATH = Path.home() / ".cache" / "ai-agents" / "assistants.json"
+
+# Asistente recordado en disco: basta el ID para crear runs sin consultar la API.
+# La huella (modelo + instrucciones) indica si hay que actualizarlo antes de usarlo.
+_AsistenteCacheado = namedtuple("_AsistenteCacheado", ["id", "name", "huella"])
+
+
+def _huella_asistente(model: Optional[str], instructions: Optional[str]) -> str:
+    """Hash del modelo y las instrucciones con que se configuró un asistente."""
+    return hashlib.sha256(f"{model}|{instructions or ''}".encode("utf-8")).hexdigest()
+
+
+def _clave_cache_asistentes(api_key: str) -> str:
+    """Hash de la clave de API, para no guardarla en claro en el archivo de caché."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _leer_ids_asistentes(api_key: str) -> Dict[str, _AsistenteCacheado]:
+    """
+    Lee del archivo de caché los asistentes conocidos para una clave de API.
+
+    Args:
+        api_key: Clave de API
+
+    Returns:
+        Diccionario nombre -> asistente cacheado (vacío si no hay caché o es ilegible)
+    """
+    try:
+        with open(_ASSISTANT_CACHE_PATH, "r", encoding="utf-8") as f:
+            entradas = json.load(f).get(_clave_cache_asistentes(api_key), {})
+        asistentes = {}
+        for nombre, entrada in entradas.items():
+            # Las entradas antiguas guardaban solo el ID, sin huella
+            if isinstance(entrada, str):
+                asistentes[nombre] = _AsistenteCacheado(entrada, nombre, None)
+            else:
+                asistentes[nombre] = _AsistenteCacheado(entrada["id"], nombre, entrada.get("huella"))
+        return asistentes
+    except (OSError, ValueError, AttributeError, KeyError, TypeError):
+        return {}
+
+
+def _guardar_ids_asistentes(api_key: str, asistentes: Dict[str, _AsistenteCacheado]) -> None:
+    """
+    Guarda en el archivo de caché los asistentes de una clave de API.
+
+    Args:
+        api_key: Clave de API
+        asistentes: Diccionario nombre -> asistente cacheado
+    """
+    try:
+        with open(_ASSISTANT_CACHE_PATH, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        datos = {}
+    if not isinstance(datos, dict):
+        datos = {}
+    datos[_clave_cache_asistentes(api_key)] = {
+        nombre: {"id": a.id, "huella": a.huella} for nombre, a in asistentes.items()
+    }
+
+    try:
+        _ASSISTANT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica para que otro proceso nunca lea un archivo a medias
+        tmp_path = _ASSISTANT_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        os.replace(tmp_path, _ASSISTANT_CACHE_PATH)
+    except OSError as e:
+        print(f"No se pudo guardar la caché de asistentes: {e}")
+
+
+# Escrituras de salidas en segundo plano, compartidas por todos los agentes
+_save_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="save-")
+
+
+@lru_cache(maxsize=None)
+def _asegurar_directorio(path: str) -> None:
+    """Crea un directorio de salida una sola vez por proceso."""
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+
+def _escribir_archivo(path: str, content: str) -> None:
+    """Escribe un archivo de salida; los errores se informan porque nadie espera el resultado."""
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    except OSError as e:
+        print(f"Error al guardar la salida en {path}: {e}")
+
+
+@lru_cache(maxsize=128)
+def _read_prompt_file(path: str) -> str:
+    """Lee un archivo de prompt una sola vez por ruta; los agentes que lo comparten reutilizan el texto."""
+    try:
+        # Lectura binaria y un único decode, sin la capa de decodificación incremental del modo texto
+        with open(path, "rb") as f:
+            texto = f.read().decode("utf-8")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Prompt file not found: {path}") from None
+    # Normalizar saltos de línea como hacía el modo texto
+    if "\r" in texto:
+        texto = texto.replace("\r\n", "\n").replace("\r", "\n")
+    return texto
+
+
+def _compilar_plantilla(plantilla: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+    """
+    Analiza una plantilla de prompt una sola vez en pares (texto literal, campo).
+
+    Args:
+        plantilla: Plantilla con campos {nombre}
+
+    Returns:
+        Los pares, o None si la plantilla no es válida o usa especificadores de formato,
+        conversiones, campos posicionales o accesos a atributos (se usa entonces str.format_map)
+    """
+    partes = []
+    try:
+        for literal, campo, spec, conversion in string.Formatter().parse(plantilla):
+            if campo is not None and (spec or conversion or not campo.isidentifier()):
+                return None
+            partes.append((literal, campo))
+    except ValueError:
+        return None
+    return tuple(partes)
 
 
 class Agent(ABC):
     # Sistema de mensajería compartido entre todos los agentes
     _sistema_mensajeria: Optional[SistemaMensajeria] = None
+    # Extensión de los archivos escritos por _save_output
+    _output_ext = "txt"
+
+    # Clientes de API compartidos por (proveedor, clave de API): un único pool de conexiones HTTP por cuenta
+    _client_pool: Dict[Tuple[str, str], Any] = {}
+    _client_pool_lock = threading.Lock()
+
+    @classmethod
+    def _get_client(cls, provider: str, api_key: str) -> Any:
+        """
+        Devuelve el cliente compartido para un proveedor y una clave de API, creándolo si no existe.
+
+        Args:
+            provider: "openai", "openai-async", "anthropic" o "anthropic-async"
+            api_key: Clave de API
+
+        Returns:
+            Cliente del proveedor
+        """
+        clave = (provider, api_key)
+        with cls._client_pool_lock:
+            cliente = cls._client_pool.get(clave)
+            if cliente is None:
+                if provider == "openai":
+                    cliente = OpenAI(api_key=api_key, http_client=DefaultHttpxClient(**_HTTP_OPCIONES))
+                elif provider == "openai-async":
+                    cliente = AsyncOpenAI(api_key=api_key, http_client=DefaultAsyncHttpxClient(**_HTTP_OPCIONES))
+                else:
+                    # Importación diferida: anthropic solo se carga si algún agente lo usa
+                    try:
+                        import anthropic
+                    except ImportError as e:
+                        raise ImportError(
+                            "El paquete 'anthropic' no está instalado. "
+                            "Instálalo con 'pip install anthropic' para usar el proveedor Anthropic."
+                        ) from e
+                    if provider == "anthropic-async":
+                        cliente = anthropic.AsyncAnthropic(
+                            api_key=api_key, http_client=anthropic.DefaultAsyncHttpxClient(**_HTTP_OPCIONES))
+                    else:
+                        cliente = anthropic.Anthropic(
+                            api_key=api_key, http_client=anthropic.DefaultHttpxClient(**_HTTP_OPCIONES))
+                cls._client_pool[clave] = cliente
+            return cliente
 
     @classmethod
     def configurar_mensajeria(cls, sistema_mensajeria: SistemaMensajeria) -> None:
@@ -34,19 +224,24 @@ class Agent(ABC):
     def __init__(self, config: AgentConfig):
         self.config = config
         self.prompt_template = self._load_prompt(self.config.prompt_path)
+        self._prompt_formatter = self.prompt_template.format_map
+        self._format_parts = _compilar_plantilla(self.prompt_template)
+        # Prefijo de las rutas de salida (directorio y nombre del agente), calculado una sola vez
+        self._output_prefix = os.path.join(config.output_dir, f"{config.name.lower()}-")
+        if config.save_outputs:
+            _asegurar_directorio(config.output_dir)
         self.client = None
         self.callbacks = {}  # Para almacenar callbacks de respuesta
+        # Caché de respuestas compartida; solo se usa si el agente declara prompts deterministas
+        self._cache = obtener_cache(config.cache_path) if config.cacheable else None
+        # Limitador compartido por todos los agentes con la misma clave y modelo
+        self._limitador = obtener_limitador(config.api_key, config.model, config.rpm_limit, config.tpm_limit)
 
         # Inicializar cliente según el proveedor
         if config.provider == "openai":
-            self.client = OpenAI(api_key=config.api_key)
+            self.client = Agent._get_client("openai", config.api_key)
         elif config.provider == "anthropic":
-            if not ANTHROPIC_AVAILABLE:
-                raise ImportError(
-                    "El paquete 'anthropic' no está instalado. "
-                    "Instálalo con 'pip install anthropic' para usar el proveedor Anthropic."
-                )
-            self.client = Anthropic(api_key=config.api_key)
+            self.client = Agent._get_client("anthropic", config.api_key)
 
         # Registrar el agente para recibir mensajes dirigidos a él
         if self._sistema_mensajeria:
@@ -55,19 +250,16 @@ class Agent(ABC):
     def _registrar_para_mensajes(self) -> None:
         """Registra el agente para recibir mensajes dirigidos a él."""
         if self._sistema_mensajeria:
-            self._sistema_mensajeria.suscribir("*", self._procesar_mensaje_entrante)
+            self._sistema_mensajeria.suscribir_destinatario(self.config.name, self._procesar_mensaje_entrante)
 
     def _procesar_mensaje_entrante(self, mensaje: Mensaje) -> None:
         """
         Procesa un mensaje entrante y ejecuta la acción apropiada.
+        El sistema de mensajería solo entrega aquí los mensajes dirigidos a este agente.
 
         Args:
             mensaje: El mensaje recibido
         """
-        # Solo procesar mensajes dirigidos a este agente
-        if mensaje.destinatario != self.config.name:
-            return
-
         if self.config.verbose:
             print(f"[{self.config.name}] Recibido: {mensaje}")
 
@@ -106,7 +298,7 @@ class Agent(ABC):
             tipo_mensaje: Tipo de mensaje a manejar
             callback: Función que procesará el mensaje
         """
-        self.callbacks[tipo_mensaje] = callback
+        self.callbacks[sys.intern(tipo_mensaje)] = callback
 
     def enviar_mensaje(
             self,
@@ -146,21 +338,16 @@ class Agent(ABC):
             metadata=metadata or {}
         )
 
-        mensaje_id = self._sistema_mensajeria.publicar(mensaje)
-
         # Si no se debe esperar respuesta, solo retornar el ID
         if not esperar_respuesta:
-            return mensaje_id
+            return self._sistema_mensajeria.publicar(mensaje)
 
-        # Esperar respuesta con timeout
-        start_time = time.time()
-        while timeout is None or (time.time() - start_time) < timeout:
-            respuestas = self._sistema_mensajeria.obtener_respuestas(mensaje_id)
-            if respuestas:
-                return respuestas[0]
-            time.sleep(0.1)  # Pequeña pausa para no consumir CPU
+        # Registrar la espera antes de publicar: la respuesta puede llegar dentro de publicar
+        self._sistema_mensajeria.registrar_espera(mensaje.id)
+        mensaje_id = self._sistema_mensajeria.publicar(mensaje)
 
-        return None  # Timeout sin respuesta
+        # Bloquear hasta que publicar active el evento o se agote el timeout (None si no hay respuesta)
+        return self._sistema_mensajeria.esperar_respuesta(mensaje_id, timeout)
 
     def consultar_agente(
             self,
@@ -235,70 +422,179 @@ class Agent(ABC):
         filtro_emisor = self.config.name if solo_propios else None
         filtro_destinatario = self.config.name if solo_propios else None
 
+        # El filtro de tipos se aplica antes del límite para no perder mensajes de los tipos pedidos
         mensajes = self._sistema_mensajeria.obtener_mensajes(
             emisor=filtro_emisor,
             destinatario=filtro_destinatario,
-            tipo=tipos[0] if tipos and len(tipos) == 1 else None,
+            tipos=frozenset(tipos) if tipos else None,
             limite=limite
         )
 
-        # Filtrar por múltiples tipos si se especificaron
-        if tipos and len(tipos) > 1:
-            mensajes = [m for m in mensajes if m.tipo in tipos]
-
         # Convertir a diccionarios
         return [m.to_dict() for m in mensajes]
 
     def _load_prompt(self, path: str) -> str:
-        if not Path(path).exists():
-            raise FileNotFoundError(f"Prompt file not found: {path}")
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-
-    def _save_output(self, content: str, iteration_id: str) -> str:
-        Path(self.config.output_dir).mkdir(parents=True, exist_ok=True)
-        filename = f"{self.config.name.lower()}-{iteration_id}.txt"
-        full_path = os.path.join(self.config.output_dir, filename)
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        # Los errores no se cachean: un archivo creado más tarde se leerá en el siguiente intento
+        return _read_prompt_file(path)
+
+    def _save_output(self, content: str, iteration_id: str) -> Optional[str]:
+        if not self.config.save_outputs:
+            return None
+        full_path = f"{self._output_prefix}{iteration_id}.{self._output_ext}"
+        # La escritura se hace en segundo plano; la ruta se devuelve sin esperar al disco
+        _save_executor.submit(_escribir_archivo, full_path, content)
         if self.config.verbose:
             print(f"[{self.config.name}] Resultado guardado en: {full_path}")
         return full_path
 
+    def _clave_cache(self, **partes) -> Optional[str]:
+        """
+        Calcula la clave de caché de una petición, o None si la caché está desactivada.
+
+        Args:
+            **partes: Elementos de la petición además del modelo y el prompt de sistema
+
+        Returns:
+            Clave de caché o None
+        """
+        if self._cache is None:
+            return None
+        return clave_cache(model=self.config.model, system=self.prompt_template, **partes)
+
+    def _respuesta_cacheada(self, clave: Optional[str], prompt: str) -> Optional[str]:
+        """
+        Busca una respuesta en caché y, si la encuentra, notifica los tokens ahorrados.
+
+        Args:
+            clave: Clave calculada con _clave_cache (None si la caché está desactivada)
+            prompt: Mensaje enviado, para estimar los tokens ahorrados
+
+        Returns:
+            Respuesta cacheada o None
+        """
+        if clave is None:
+            return None
+        respuesta = self._cache.get(clave)
+        if respuesta is None:
+            return None
+
+        tokens_saved = estimar_tokens(prompt) + estimar_tokens(respuesta)
+        if self.config.verbose:
+            print(f"[{self.config.name}] Respuesta servida desde caché (~{tokens_saved} tokens ahorrados)")
+        self._notificar(
+            "respuesta_cacheada",
+            "Respuesta servida desde caché",
+            lambda: {
+                "modelo": self.config.model,
+                "tokens_saved": tokens_saved
+            }
+        )
+        return respuesta
+
+    def _notificar(self, tipo: str, contenido: str, metadata: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Publica una notificación del ciclo de vida del agente solo si tiene algún efecto.
+
+        El mensaje y sus metadatos se construyen únicamente cuando hay suscriptores del tipo
+        o el sistema de mensajería guarda los mensajes en disco.
+
+        Args:
+            tipo: Tipo de mensaje
+            contenido: Contenido del mensaje
+            metadata: Función que construye los metadatos
+        """
+        sistema = self._sistema_mensajeria
+        if sistema is None or not sistema.hay_interes(tipo):
+            return
+        sistema.publicar(
+            Mensaje(
+                emisor=self.config.name,
+                tipo=tipo,
+                contenido=contenido,
+                metadata=metadata()
+            )
+        )
+
+    def _guardar_en_cache(self, clave: Optional[str], respuesta: str) -> None:
+        """Guarda una respuesta en caché si está activada y la respuesta no está vacía."""
+        if clave is not None and respuesta:
+            self._cache.set(clave, respuesta, ttl=self.config.cache_ttl)
+
     def _generate_iteration_id(self) -> str:
-        return datetime.now().strftime("id-%d%m%Y-%H%M%S")
+        # Mismo formato que strftime("id-%d%m%Y-%H%M%S"), sin crear un datetime ni pasar por el locale
+        t = time.localtime()
+        return f"id-{t.tm_mday:02d}{t.tm_mon:02d}{t.tm_year}-{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}"
 
     def _format_prompt(self, **kwargs) -> str:
-        return self.prompt_template.format(**kwargs)
+        if self._format_parts is None:
+            return self._prompt_formatter(kwargs)
+        partes = []
+        for literal, campo in self._format_parts:
+            partes.append(literal)
+            if campo is not None:
+                partes.append(str(kwargs[campo]))
+        return "".join(partes)
 
     @abstractmethod
     def run(self, **kwargs) -> str:
         pass
 
 
+# Mensaje de usuario para implementar requerimientos a partir de un diseño; el dedent se hace una sola vez
+_PROMPT_DESARROLLO = textwrap.dedent("""
+    Necesito implementar código que cumpla con los siguientes requerimientos funcionales:
+
+    {reqs}
+
+    El diseño técnico propuesto es el siguiente:
+
+    {diseno}
+
+    Por favor, proporciona una implementación completa y funcional que cumpla con estos requerimientos.
+    Devuelve únicamente el código implementado, organizado en archivos según sea necesario.
+    """)
+
+
 class AnthropicAgent(Agent):
     """
     Agente que utiliza la API de Anthropic.
     Utiliza el contenido del prompt como parámetro system.
     """
 
-    def run(self, **kwargs) -> str:
-        # Formateamos el prompt con los argumentos proporcionados
-        formatted_prompt = self._format_prompt(**kwargs)
+    @cached_property
+    def _system_anthropic(self) -> Union[str, List[Dict[str, Any]]]:
+        """
+        Parámetro system de las peticiones; el prompt es estático, así que se construye una sola vez.
 
-        # Creamos el ID de iteración
-        iteration_id = self._generate_iteration_id()
+        Con enable_prompt_cache el prompt de sistema se marca con cache_control para que
+        Anthropic reutilice su prefijo entre llamadas en lugar de procesarlo cada vez.
 
-        if self.config.verbose:
-            print(f"[{self.config.name}] Ejecutando con {self.config.model}...")
+        Returns:
+            El prompt como texto, o como bloque con cache_control
+        """
+        if not self.config.enable_prompt_cache:
+            return self.prompt_template
+        return [{"type": "text", "text": self.prompt_template, "cache_control": {"type": "ephemeral"}}]
 
+    @property
+    def async_client(self) -> Any:
+        """Cliente asíncrono de Anthropic compartido, creado la primera vez que se necesita."""
+        return Agent._get_client("anthropic-async", self.config.api_key)
+
+    def _preparar_peticion(self, kwargs: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        Obtiene el mensaje de usuario y max_tokens a partir de los argumentos de run.
+
+        Args:
+            kwargs: Argumentos recibidos por run/arun
+
+        Returns:
+            Tupla (mensaje de usuario, max_tokens)
+        """
         # Para Anthropic, utilizamos el parámetro system para establecer el prompt como instrucción del sistema
         # Agregamos el parámetro max_tokens requerido (por defecto 4000)
         max_tokens = kwargs.get("max_tokens", 4000)
 
-        # Obtener el mensaje de usuario, ya sea de kwargs['message'] o usando el formatted_prompt
-        user_message = kwargs.get("message", formatted_prompt)
-
         # Si recibimos una lista como primer argumento (comportamiento específico de Developer)
         if isinstance(kwargs.get("requerimientos_funcionales"), list) and isinstance(kwargs.get("diseno_tecnico"),
                                                                                      list):
@@ -306,88 +602,191 @@ class AnthropicAgent(Agent):
             diseno = kwargs.get("diseno_tecnico", [])
 
             # Formatear el mensaje para el usuario
-            reqs_texto = "\n".join([f"- {req}" for req in reqs])
+            reqs_texto = "\n".join(f"- {req}" for req in reqs)
             diseno_texto = "\n".join(diseno)
 
-            user_message = f"""
-            Necesito implementar código que cumpla con los siguientes requerimientos funcionales:
+            return _PROMPT_DESARROLLO.format(reqs=reqs_texto, diseno=diseno_texto), max_tokens
+
+        # Obtener el mensaje de usuario, ya sea de kwargs['message'] o formateando el prompt
+        if "message" in kwargs:
+            return kwargs["message"], max_tokens
+        return self._format_prompt(**kwargs), max_tokens
+
+    def _parametros_peticion(self, user_message: str, max_tokens: int) -> Dict[str, Any]:
+        """Argumentos de messages.stream, comunes a run y arun."""
+        return {
+            "model": self.config.model,
+            "system": self._system_anthropic,
+            "max_tokens": max_tokens,
+            "messages": [
+                {"role": "user", "content": user_message}
+            ]
+        }
+
+    def _observar_cuota(self, headers) -> None:
+        """
+        Pasa al limitador la cuota restante de peticiones y tokens que informa Anthropic.
+
+        Args:
+            headers: Cabeceras HTTP de la respuesta (anthropic-ratelimit-*)
+        """
+        ahora = datetime.now(timezone.utc)
+        for recurso in ("requests", "tokens"):
+            try:
+                restantes = int(headers[f"anthropic-ratelimit-{recurso}-remaining"])
+                limite = int(headers[f"anthropic-ratelimit-{recurso}-limit"])
+                reinicio = datetime.fromisoformat(headers[f"anthropic-ratelimit-{recurso}-reset"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._limitador.observar_cuota(restantes, limite, (reinicio - ahora).total_seconds())
+
+    def _completar_ejecucion(self, response, clave: Optional[str], iteration_id: str) -> str:
+        """
+        Extrae el texto de la respuesta, lo guarda y notifica la ejecución completada.
 
-            {reqs_texto}
+        Args:
+            response: Mensaje final de messages.stream
+            clave: Clave de caché de la petición (None si la caché está desactivada)
+            iteration_id: ID de la iteración
 
-            El diseño técnico propuesto es el siguiente:
+        Returns:
+            Texto de la respuesta
+        """
+        # Extraemos el contenido de la respuesta
+        content = response.content[0].text
+        self._guardar_en_cache(clave, content)
+
+        # Guardar la salida si está configurado para hacerlo
+        self._save_output(content, iteration_id)
+
+        # Notificar al sistema de mensajería si está configurado
+        self._notificar(
+            "ejecucion_completada",
+            f"Ejecución del modelo {self.config.model} completada",
+            lambda: {
+                "modelo": self.config.model,
+                "tokens_respuesta": response.usage.output_tokens,
+                "iteracion_id": iteration_id,
+                # Tokens del prompt de sistema leídos de / escritos en la caché de Anthropic
+                "cache_read_input_tokens": getattr(response.usage, "cache_read_input_tokens", None) or 0,
+                "cache_creation_input_tokens": getattr(response.usage, "cache_creation_input_tokens", None) or 0
+            }
+        )
 
-            {diseno_texto}
+        return content
 
-            Por favor, proporciona una implementación completa y funcional que cumpla con estos requerimientos.
-            Devuelve únicamente el código implementado, organizado en archivos según sea necesario.
-            """
+    def _notificar_error_ejecucion(self, e: Exception) -> None:
+        """Informa de un error al llamar al modelo de Anthropic."""
+        error_msg = f"Error al ejecutar modelo Anthropic: {str(e)}"
+        print(f"[{self.config.name}] ⚠️ {error_msg}")
 
-        try:
-            response = self.client.messages.create(
-                model=self.config.model,
-                system=self.prompt_template,
-                max_tokens=max_tokens,  # Añadimos el parámetro max_tokens
-                messages=[
-                    {"role": "user", "content": user_message}
-                ]
+        # Notificar error si el sistema de mensajería está configurado
+        if self._sistema_mensajeria:
+            self._sistema_mensajeria.publicar(
+                Mensaje(
+                    emisor=self.config.name,
+                    tipo="error_ejecucion",
+                    contenido=error_msg,
+                    metadata={
+                        "error": str(e),
+                        "modelo": self.config.model
+                    }
+                )
             )
 
-            # Extraemos el contenido de la respuesta
-            content = response.content[0].text
-
-            # Guardar la salida si está configurado para hacerlo
-            self._save_output(content, iteration_id)
-
-            # Notificar al sistema de mensajería si está configurado
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="ejecucion_completada",
-                        contenido=f"Ejecución del modelo {self.config.model} completada",
-                        metadata={
-                            "modelo": self.config.model,
-                            "tokens_respuesta": len(content.split()),
-                            "iteracion_id": iteration_id
-                        }
-                    )
-                )
+    def run(self, **kwargs) -> str:
+        # Creamos el ID de iteración
+        iteration_id = self._generate_iteration_id()
 
-            return content
+        if self.config.verbose:
+            print(f"[{self.config.name}] Ejecutando con {self.config.model}...")
 
-        except Exception as e:
-            error_msg = f"Error al ejecutar modelo Anthropic: {str(e)}"
-            print(f"[{self.config.name}] ⚠️ {error_msg}")
-
-            # Notificar error si el sistema de mensajería está configurado
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="error_ejecucion",
-                        contenido=error_msg,
-                        metadata={
-                            "error": str(e),
-                            "modelo": self.config.model
-                        }
-                    )
-                )
+        user_message, max_tokens = self._preparar_peticion(kwargs)
 
+        # Los prompts deterministas idénticos se sirven desde caché sin llamar al modelo
+        clave = self._clave_cache(user=user_message, max_tokens=max_tokens)
+        cacheada = self._respuesta_cacheada(clave, user_message)
+        if cacheada is not None:
+            return cacheada
+
+        try:
+            self._limitador.acquire(estimar_tokens(user_message) + max_tokens)
+            # En streaming: las respuestas largas (p. ej. el Developer) no dependen de que una única
+            # lectura HTTP sin actividad supere el timeout; el mensaje final es el mismo que con create
+            with self.client.messages.stream(**self._parametros_peticion(user_message, max_tokens)) as stream:
+                response = stream.get_final_message()
+            self._observar_cuota(stream.response.headers)
+            self._limitador.registrar_exito()
+            return self._completar_ejecucion(response, clave, iteration_id)
+
+        except Exception as e:
+            self._limitador.registrar_error(e)
+            self._notificar_error_ejecucion(e)
             # Re-lanzar la excepción para que sea manejada por el código que llamó a este método
             raise
 
+    async def arun(self, **kwargs) -> str:
+        """
+        Variante asíncrona de run con el cliente asíncrono de Anthropic.
+
+        Args:
+            **kwargs: Los mismos argumentos que run
+
+        Returns:
+            Texto de la respuesta
+        """
+        iteration_id = self._generate_iteration_id()
+
+        if self.config.verbose:
+            print(f"[{self.config.name}] Ejecutando con {self.config.model}...")
+
+        user_message, max_tokens = self._preparar_peticion(kwargs)
+
+        clave = self._clave_cache(user=user_message, max_tokens=max_tokens)
+        cacheada = self._respuesta_cacheada(clave, user_message)
+        if cacheada is not None:
+            return cacheada
+
+        try:
+            await self._limitador.aacquire(estimar_tokens(user_message) + max_tokens)
+            async with self.async_client.messages.stream(**self._parametros_peticion(user_message, max_tokens)) as stream:
+                response = await stream.get_final_message()
+            self._observar_cuota(stream.response.headers)
+            self._limitador.registrar_exito()
+            return self._completar_ejecucion(response, clave, iteration_id)
+
+        except Exception as e:
+            self._limitador.registrar_error(e)
+            self._notificar_error_ejecucion(e)
+            raise
+
+
 class OpenAIAssistantAgent(Agent):
     """
     Agente que utiliza la API de asistentes de OpenAI (beta).
     Este tipo se usa para mantener compatibilidad con las clases existentes SME y Architect.
     """
 
+    # Asistentes conocidos por (clave de API, nombre), compartidos por todas las instancias del proceso
+    _assistant_cache: Dict[Tuple[str, str], Any] = {}
+    # Claves de API cuyos asistentes ya se cargaron (de disco o con una única llamada a list)
+    _assistant_list_loaded: Set[str] = set()
+    _assistant_lock = threading.Lock()
+
     def __init__(self, config: AgentConfig):
         super().__init__(config)
         self.assistant = None
+        self._async_client = None
         if self.client:
             self.assistant = self._create_or_get_assistant()
 
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Cliente asíncrono de OpenAI, creado la primera vez que se necesita."""
+        if self._async_client is None:
+            self._async_client = Agent._get_client("openai-async", self.config.api_key)
+        return self._async_client
+
     def _create_or_get_assistant(self):
         """
         Crea un nuevo asistente con las instrucciones del prompt, o recupera uno existente.
@@ -398,27 +797,22 @@ class OpenAIAssistantAgent(Agent):
         # Crea un nuevo asistente con las instrucciones del prompt
         instructions = self.prompt_template
 
-        # Lista los asistentes existentes
-        assistants = self.client.beta.assistants.list()
-        existing_assistant = next((a for a in assistants.data if a.name == self.config.name), None)
+        # Busca el asistente en la caché compartida (solo consulta la API la primera vez por clave)
+        existing_assistant = self._buscar_asistente_existente()
 
         if existing_assistant:
             if self.config.verbose:
                 print(f"[{self.config.name}] Utilizando asistente existente: {existing_assistant.id}")
 
             # Notificar recuperación si el sistema de mensajería está disponible
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="asistente_recuperado",
-                        contenido=f"Utilizando asistente existente: {existing_assistant.id}",
-                        metadata={
-                            "assistant_id": existing_assistant.id,
-                            "model": self.config.model
-                        }
-                    )
-                )
+            self._notificar(
+                "asistente_recuperado",
+                f"Utilizando asistente existente: {existing_assistant.id}",
+                lambda: {
+                    "assistant_id": existing_assistant.id,
+                    "model": self.config.model
+                }
+            )
 
             return existing_assistant
         else:
@@ -429,36 +823,100 @@ class OpenAIAssistantAgent(Agent):
                 model=self.config.model,
                 instructions=instructions
             )
+            self._recordar_asistente(new_assistant)
 
             if self.config.verbose:
                 print(f"[{self.config.name}] Nuevo asistente creado: {new_assistant.id}")
 
             # Notificar creación si el sistema de mensajería está disponible
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="asistente_creado",
-                        contenido=f"Nuevo asistente creado: {new_assistant.id}",
-                        metadata={
-                            "assistant_id": new_assistant.id,
-                            "model": self.config.model
-                        }
-                    )
-                )
+            self._notificar(
+                "asistente_creado",
+                f"Nuevo asistente creado: {new_assistant.id}",
+                lambda: {
+                    "assistant_id": new_assistant.id,
+                    "model": self.config.model
+                }
+            )
 
             return new_assistant
 
-    def run_with_thread(self, prompt: str) -> str:
+    def _buscar_asistente_existente(self) -> Optional[Any]:
+        """
+        Busca un asistente con el nombre de este agente en la caché compartida.
+
+        La primera vez por clave de API se cargan los IDs guardados en disco; si no hay,
+        se hace una única llamada a assistants.list() y se guardan todos los asistentes.
+        Si el modelo o el prompt del agente cambiaron, el asistente se actualiza antes de devolverlo.
+
+        Returns:
+            Un _AsistenteCacheado con su ID, o None si no existe
+        """
+        cls = OpenAIAssistantAgent
+        api_key = self.config.api_key
+        with cls._assistant_lock:
+            if api_key not in cls._assistant_list_loaded:
+                asistentes = _leer_ids_asistentes(api_key)
+                if not asistentes:
+                    # Iterar la página recorre todas las páginas, no solo la primera
+                    for a in self.client.beta.assistants.list(limit=100):
+                        asistentes.setdefault(
+                            a.name, _AsistenteCacheado(a.id, a.name, _huella_asistente(a.model, a.instructions))
+                        )
+                    _guardar_ids_asistentes(api_key, asistentes)
+                for nombre, asistente in asistentes.items():
+                    cls._assistant_cache[(api_key, nombre)] = asistente
+                cls._assistant_list_loaded.add(api_key)
+
+            asistente = cls._assistant_cache.get((api_key, self.config.name))
+
+        # Si cambió el modelo o el prompt desde que se guardó, actualizar el asistente en lugar de
+        # seguir usando instrucciones obsoletas (una única petición, solo cuando difiere la huella)
+        huella = _huella_asistente(self.config.model, self.prompt_template)
+        if asistente is not None and asistente.huella != huella:
+            actualizado = self.client.beta.assistants.update(
+                asistente.id,
+                model=self.config.model,
+                instructions=self.prompt_template
+            )
+            self._recordar_asistente(actualizado)
+            asistente = _AsistenteCacheado(actualizado.id, actualizado.name, huella)
+        return asistente
+
+    def _recordar_asistente(self, assistant) -> None:
+        """
+        Añade un asistente recién creado o actualizado a la caché compartida y al archivo en disco.
+
+        Args:
+            assistant: Asistente devuelto por assistants.create o assistants.update
+        """
+        cls = OpenAIAssistantAgent
+        api_key = self.config.api_key
+        cacheado = _AsistenteCacheado(assistant.id, assistant.name,
+                                      _huella_asistente(assistant.model, assistant.instructions))
+        with cls._assistant_lock:
+            cls._assistant_cache[(api_key, assistant.name)] = cacheado
+            asistentes = {
+                nombre: a for (clave, nombre), a in cls._assistant_cache.items()
+                if clave == api_key
+            }
+            _guardar_ids_asistentes(api_key, asistentes)
+
+    def run_with_thread(self, prompt: str, **run_kwargs) -> str:
         """
         Ejecuta el asistente con un thread nuevo.
 
         Args:
             prompt: Contenido del mensaje a enviar al asistente
+            **run_kwargs: Argumentos adicionales del run (p. ej. response_format)
 
         Returns:
             Respuesta del asistente
         """
+        clave = self._clave_cache(user=prompt, **run_kwargs)
+        cacheada = self._respuesta_cacheada(clave, prompt)
+        if cacheada is not None:
+            return cacheada
+
         # Crear un nuevo thread para esta conversación
         thread = self.client.beta.threads.create()
         thread_id = thread.id
@@ -467,17 +925,13 @@ class OpenAIAssistantAgent(Agent):
             print(f"[{self.config.name}] Nuevo thread creado: {thread_id}")
 
         # Notificar creación de thread si el sistema de mensajería está disponible
-        if self._sistema_mensajeria:
-            self._sistema_mensajeria.publicar(
-                Mensaje(
-                    emisor=self.config.name,
-                    tipo="thread_creado",
-                    contenido=f"Nuevo thread creado: {thread_id}",
-                    metadata={
-                        "thread_id": thread_id
-                    }
-                )
-            )
+        self._notificar(
+            "thread_creado",
+            f"Nuevo thread creado: {thread_id}",
+            lambda: {
+                "thread_id": thread_id
+            }
+        )
 
         # Agregar mensaje al thread
         self.client.beta.threads.messages.create(
@@ -486,92 +940,119 @@ class OpenAIAssistantAgent(Agent):
             content=prompt
         )
 
-        # Ejecutar el asistente en este thread
-        run = self.client.beta.threads.runs.create(
+        # Ejecutar el asistente en este thread, respetando los límites de peticiones y tokens
+        self._limitador.acquire(estimar_tokens(prompt))
+        # Ejecutar en streaming: el texto llega a medida que se genera, sin consultar
+        # el estado del run ni descargar los mensajes del thread al terminar
+        partes = []
+        start_time = time.monotonic()
+        with self.client.beta.threads.runs.stream(
             thread_id=thread_id,
-            assistant_id=self.assistant.id
+            assistant_id=self.assistant.id,
+            **run_kwargs
+        ) as stream:
+            for delta in stream.text_deltas:
+                partes.append(delta)
+                start_time = self._notificar_run_en_progreso(thread_id, stream.current_run, start_time)
+            run = stream.get_final_run()
+
+        # Verificar si la ejecución fue exitosa
+        self._registrar_resultado_run(run)
+        if run.status != "completed":
+            return self._notificar_run_fallido(thread_id, run)
+
+        texto = self._notificar_respuesta(thread_id, "".join(partes))
+        self._guardar_en_cache(clave, texto)
+        return texto
+
+    def _registrar_resultado_run(self, run) -> None:
+        """Ajusta el limitador según el resultado de un run (los 429 llegan como last_error del run)."""
+        if run.status == "completed":
+            self._limitador.registrar_exito()
+        elif run.last_error is not None and run.last_error.code == "rate_limit_exceeded":
+            self._limitador.reducir()
+
+    def _notificar_run_en_progreso(self, thread_id: str, run, start_time: float) -> float:
+        """
+        Publica el estado de un run en curso como mucho cada 10 segundos.
+
+        Args:
+            thread_id: ID del thread
+            run: Run en curso
+            start_time: Momento de la última notificación
+
+        Returns:
+            Momento de la última notificación tras esta llamada
+        """
+        # Solo notificar cada 10 segundos, y solo si alguien escucha estos mensajes
+        if not self._sistema_mensajeria or (time.monotonic() - start_time) <= 10:
+            return start_time
+        if not self._sistema_mensajeria.tiene_suscriptores("run_en_progreso"):
+            return start_time
+
+        self._notificar(
+            "run_en_progreso",
+            f"Run en progreso: {run.status}",
+            lambda: {
+                "thread_id": thread_id,
+                "run_id": run.id,
+                "status": run.status
+            }
         )
+        return time.monotonic()
 
-        # Esperar a que termine la ejecución
-        start_time = time.time()
-        while run.status in ["queued", "in_progress"]:
-            # Notificar estado si el sistema de mensajería está disponible
-            if self._sistema_mensajeria and (time.time() - start_time) > 10:
-                # Solo notificar cada 10 segundos para no saturar
-                start_time = time.time()
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="run_en_progreso",
-                        contenido=f"Run en progreso: {run.status}",
-                        metadata={
-                            "thread_id": thread_id,
-                            "run_id": run.id,
-                            "status": run.status
-                        }
-                    )
-                )
+    def _notificar_run_fallido(self, thread_id: str, run) -> str:
+        """
+        Informa de un run que no terminó en estado completed.
 
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
-            )
-            time.sleep(1)  # Pequeña pausa para no saturar la API
+        Args:
+            thread_id: ID del thread
+            run: Run terminado
 
-        # Verificar si la ejecución fue exitosa
-        if run.status != "completed":
-            error_msg = f"La ejecución del asistente falló con estado: {run.status}"
-            print(f"[{self.config.name}] ⚠️ {error_msg}")
-
-            # Notificar error si el sistema de mensajería está disponible
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="run_fallido",
-                        contenido=error_msg,
-                        metadata={
-                            "thread_id": thread_id,
-                            "run_id": run.id,
-                            "status": run.status
-                        }
-                    )
+        Returns:
+            Texto de error a devolver al llamador
+        """
+        error_msg = f"La ejecución del asistente falló con estado: {run.status}"
+        print(f"[{self.config.name}] ⚠️ {error_msg}")
+
+        # Notificar error si el sistema de mensajería está disponible
+        if self._sistema_mensajeria:
+            self._sistema_mensajeria.publicar(
+                Mensaje(
+                    emisor=self.config.name,
+                    tipo="run_fallido",
+                    contenido=error_msg,
+                    metadata={
+                        "thread_id": thread_id,
+                        "run_id": run.id,
+                        "status": run.status
+                    }
                 )
+            )
 
-            return f"Error: {run.status}"
+        return f"Error: {run.status}"
 
-        # Obtener los mensajes resultantes
-        messages = self.client.beta.threads.messages.list(
-            thread_id=thread_id
-        )
+    def _notificar_respuesta(self, thread_id: str, texto: str) -> str:
+        """
+        Notifica la respuesta recibida del asistente, o su ausencia.
 
-        # Extraer el contenido del último mensaje (respuesta del asistente)
-        assistant_messages = [
-            msg for msg in messages.data
-            if msg.role == "assistant"
-        ]
-
-        if assistant_messages:
-            latest_message = assistant_messages[0]
-            content_parts = [
-                part.text.value for part in latest_message.content
-                if hasattr(part, "text") and hasattr(part.text, "value")
-            ]
-            texto = "\n".join(content_parts)
+        Args:
+            thread_id: ID del thread
+            texto: Texto completo recibido en streaming
 
+        Returns:
+            Texto de la respuesta, o cadena vacía si el asistente no respondió
+        """
+        if texto:
             # Notificar respuesta si el sistema de mensajería está disponible
-            if self._sistema_mensajeria:
-                self._sistema_mensajeria.publicar(
-                    Mensaje(
-                        emisor=self.config.name,
-                        tipo="respuesta_recibida",
-                        contenido=f"Respuesta recibida ({len(texto)} caracteres)",
-                        metadata={
-                            "thread_id": thread_id,
-                            "respuesta_length": len(texto)
-                        }
-                    )
-                )
+            self._notificar(
+                "respuesta_recibida",
+                f"Respuesta recibida ({len(texto)} caracteres)",
+                lambda: {
+                    "thread_id": thread_id,
+                    "respuesta_length": len(texto)
+                }
+            )
 
             return texto
 
@@ -594,6 +1075,66 @@ class OpenAIAssistantAgent(Agent):
 
         return ""
 
+    async def arun_with_thread(self, prompt: str, **run_kwargs) -> str:
+        """
+        Variante asíncrona de run_with_thread.
+
+        Usa el cliente asíncrono de OpenAI en streaming, de modo que varios agentes pueden
+        ejecutarse con asyncio.gather sin ocupar hilos.
+
+        Args:
+            prompt: Contenido del mensaje a enviar al asistente
+            **run_kwargs: Argumentos adicionales del run (p. ej. response_format)
+
+        Returns:
+            Respuesta del asistente
+        """
+        clave = self._clave_cache(user=prompt, **run_kwargs)
+        cacheada = self._respuesta_cacheada(clave, prompt)
+        if cacheada is not None:
+            return cacheada
+
+        thread = await self.async_client.beta.threads.create()
+        thread_id = thread.id
+
+        if self.config.verbose:
+            print(f"[{self.config.name}] Nuevo thread creado: {thread_id}")
+
+        self._notificar(
+            "thread_creado",
+            f"Nuevo thread creado: {thread_id}",
+            lambda: {
+                "thread_id": thread_id
+            }
+        )
+
+        await self.async_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=prompt
+        )
+
+        await self._limitador.aacquire(estimar_tokens(prompt))
+        partes = []
+        start_time = time.monotonic()
+        async with self.async_client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=self.assistant.id,
+            **run_kwargs
+        ) as stream:
+            async for delta in stream.text_deltas:
+                partes.append(delta)
+                start_time = self._notificar_run_en_progreso(thread_id, stream.current_run, start_time)
+            run = await stream.get_final_run()
+
+        self._registrar_resultado_run(run)
+        if run.status != "completed":
+            return self._notificar_run_fallido(thread_id, run)
+
+        texto = self._notificar_respuesta(thread_id, "".join(partes))
+        self._guardar_en_cache(clave, texto)
+        return texto
+
     @abstractmethod
     def run(self, **kwargs) -> str:
         """
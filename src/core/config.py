@@ -1,6 +1,7 @@
 # src/core/config.py
 
 from dataclasses import dataclass
+from typing import Any, Dict, Optional
 
 @dataclass
 class AgentConfig:
@@ -11,3 +12,12 @@ class AgentConfig:
     prompt_path: str
     verbose: bool = True
     output_dir: str = "outputs"
+    save_outputs: bool = True  # Si es False, no se escriben las salidas intermedias en disco
+    response_format: Optional[Dict[str, Any]] = None  # Ej: {"type": "json_object"} para respuestas JSON nativas
+    max_parallel: int = 8  # Máximo de llamadas concurrentes al proveedor en las variantes asíncronas
+    rpm_limit: int = 500  # Peticiones por minuto permitidas por el proveedor para este modelo
+    tpm_limit: int = 200_000  # Tokens por minuto permitidos por el proveedor para este modelo
+    cacheable: bool = False  # Si es True, los prompts idénticos se responden desde caché (solo para prompts deterministas)
+    cache_path: Optional[str] = None  # Archivo SQLite de la caché; None para cachear solo en memoria
+    cache_ttl: float = 3600  # Segundos que una respuesta cacheada sigue siendo válida
+    enable_prompt_cache: bool = True  # Marca el prompt de sistema con cache_control en Anthropic
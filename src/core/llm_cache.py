@@ -0,0 +1,117 @@
+# src/core/llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Tuple
+
+
+class CacheBackend(Protocol):
+    """Interfaz mínima de un almacén de respuestas del modelo."""
+
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ...
+
+
+class MemoryCache:
+    """Caché LRU en memoria con caducidad opcional por entrada."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._datos: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entrada = self._datos.get(key)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._datos[key]
+                return None
+            self._datos.move_to_end(key)
+            return valor
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expira = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._datos[key] = (expira, value)
+            self._datos.move_to_end(key)
+            if len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+
+class SQLiteCache:
+    """Caché persistente en un archivo SQLite, compartida entre ejecuciones."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT valor, expira FROM respuestas WHERE clave = ?", (key,)
+            ).fetchone()
+            if fila is None:
+                return None
+            valor, expira = fila
+            if expira is not None and expira < time.time():
+                with self._conn:
+                    self._conn.execute("DELETE FROM respuestas WHERE clave = ?", (key,))
+                return None
+            return valor
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expira = time.time() + ttl if ttl else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, expira) VALUES (?, ?, ?)",
+                (key, value, expira)
+            )
+
+
+def clave_cache(**partes) -> str:
+    """
+    Calcula la clave de caché de una petición a partir de todo lo que determina su respuesta.
+
+    Args:
+        **partes: Modelo, prompt de sistema, mensaje de usuario, max_tokens, etc.
+
+    Returns:
+        Hash sha256 en hexadecimal
+    """
+    return hashlib.sha256(json.dumps(partes, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+_caches: Dict[Optional[str], CacheBackend] = {}
+_caches_lock = threading.Lock()
+
+
+def obtener_cache(ruta: Optional[str] = None) -> CacheBackend:
+    """
+    Devuelve la caché compartida para una ruta (SQLite) o la caché en memoria si ruta es None.
+
+    Args:
+        ruta: Ruta del archivo SQLite, o None para usar memoria
+
+    Returns:
+        CacheBackend: Caché compartida por todos los agentes que usan la misma ruta
+    """
+    with _caches_lock:
+        cache = _caches.get(ruta)
+        if cache is None:
+            cache = SQLiteCache(ruta) if ruta else MemoryCache()
+            _caches[ruta] = cache
+        return cache
@@ -1,17 +1,64 @@
 # src/core/messaging.py
+import atexit
+import bisect
+import heapq
+import itertools
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Union, Type
+from typing import List, Dict, Any, FrozenSet, Optional, TextIO, Union, Type
 import json
 import os
+import sys
+import threading
 import uuid
 from pathlib import Path
 
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Umbrales a partir de los cuales se vuelca a disco el buffer de mensajes de un archivo
+_MAX_BUFFER_MENSAJES = 100
+_MAX_BUFFER_BYTES = 64 * 1024
+# Segundos máximos que un mensaje permanece en el buffer antes de volcarse en segundo plano
+_INTERVALO_VOLCADO = 2.0
+
+# IDs de mensaje: prefijo aleatorio por proceso + contador (next() sobre itertools.count es atómico),
+# únicos entre ejecuciones sin leer os.urandom en cada mensaje
+_PREFIJO_PROCESO = uuid.uuid4().hex[:12]
+_contador_mensajes = itertools.count()
+
+
+def _nuevo_id_mensaje() -> str:
+    """Genera un ID de mensaje único."""
+    return f"{_PREFIJO_PROCESO}{next(_contador_mensajes):012x}"
+
+
+def _serializar(datos: Dict[str, Any]) -> str:
+    """Serializa un mensaje a JSON, con orjson si está instalado."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(datos).decode("utf-8")
+    return json.dumps(datos)
+
+
+def _deserializar(linea: Union[str, bytes]) -> Dict[str, Any]:
+    """Deserializa una línea JSON del registro, con orjson si está instalado."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(linea)
+    return json.loads(linea)
+
 
 class Mensaje:
     """
     Representa un mensaje en el sistema de comunicación entre agentes.
     """
 
+    # Sin __dict__ por instancia: el historial conserva todos los mensajes publicados
+    __slots__ = ("id", "timestamp", "emisor", "destinatario", "tipo", "contenido", "id_respuesta", "metadata")
+
     def __init__(
             self,
             emisor: str,
@@ -20,7 +67,8 @@ class Mensaje:
             destinatario: Optional[str] = None,
             id_mensaje: Optional[str] = None,
             id_respuesta: Optional[str] = None,
-            metadata: Optional[Dict[str, Any]] = None
+            metadata: Optional[Dict[str, Any]] = None,
+            timestamp: Optional[datetime] = None
     ):
         """
         Inicializa un mensaje en el sistema.
@@ -33,12 +81,15 @@ class Mensaje:
             id_mensaje: Identificador único del mensaje (generado automáticamente si no se proporciona)
             id_respuesta: ID del mensaje al que responde (si es una respuesta)
             metadata: Información adicional sobre el mensaje
+            timestamp: Momento de creación (ahora si no se proporciona)
         """
-        self.id = id_mensaje or str(uuid.uuid4())
-        self.timestamp = datetime.now()
-        self.emisor = emisor
-        self.destinatario = destinatario
-        self.tipo = tipo
+        self.id = id_mensaje or _nuevo_id_mensaje()
+        self.timestamp = timestamp or datetime.now()
+        # Emisor, destinatario y tipo se repiten en todo el historial: internados, cada valor existe
+        # una sola vez en memoria y las comparaciones y búsquedas en los índices se resuelven por identidad
+        self.emisor = sys.intern(emisor)
+        self.destinatario = sys.intern(destinatario) if destinatario else destinatario
+        self.tipo = sys.intern(tipo)
         self.contenido = contenido
         self.id_respuesta = id_respuesta
         self.metadata = metadata or {}
@@ -59,26 +110,22 @@ class Mensaje:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Mensaje":
         """Crea un mensaje a partir de un diccionario."""
-        # Convertir el timestamp de string a datetime
-        if "timestamp" in data and isinstance(data["timestamp"], str):
-            data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+        # Convertir el timestamp de string a datetime sin modificar el diccionario recibido
+        timestamp = data.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
 
-        mensaje = cls(
+        return cls(
             emisor=data.get("emisor", "unknown"),
             tipo=data.get("tipo", "general"),
             contenido=data.get("contenido", ""),
             destinatario=data.get("destinatario"),
             id_mensaje=data.get("id"),
             id_respuesta=data.get("id_respuesta"),
-            metadata=data.get("metadata", {})
+            metadata=data.get("metadata", {}),
+            timestamp=timestamp
         )
 
-        # Si el timestamp estaba en el diccionario, usarlo
-        if "timestamp" in data:
-            mensaje.timestamp = data["timestamp"]
-
-        return mensaje
-
     def __str__(self) -> str:
         """Representación en string del mensaje."""
         dest = f" → {self.destinatario}" if self.destinatario else ""
@@ -99,12 +146,36 @@ class SistemaMensajeria:
             ruta_almacenamiento: Ruta donde se guardarán los registros de mensajes
         """
         self.mensajes: List[Mensaje] = []
+        # Índices secundarios sobre el historial; cada lista mantiene el orden cronológico
+        self._por_id: Dict[str, Mensaje] = {}
+        self._por_emisor: Dict[str, List[Mensaje]] = defaultdict(list)
+        self._por_destinatario: Dict[str, List[Mensaje]] = defaultdict(list)
+        self._por_tipo: Dict[str, List[Mensaje]] = defaultdict(list)
+        self._por_respuesta: Dict[str, List[Mensaje]] = defaultdict(list)
         self.suscripciones: Dict[str, List[callable]] = {}
         self.ruta_almacenamiento = ruta_almacenamiento
+        # Suscripciones por destinatario: cada mensaje dirigido se entrega solo a su agente
+        self.suscripciones_destinatario: Dict[str, List[callable]] = {}
+        # Eventos de quienes esperan respuesta, indexados por el ID del mensaje original
+        self._esperas: Dict[str, threading.Event] = {}
+        self._esperas_lock = threading.Lock()
+        # Protege el historial y los índices: los agentes pueden publicar desde varios hilos
+        # (p. ej. al construirse en paralelo), y la inserción ordenada no es atómica
+        self._indices_lock = threading.Lock()
+
+        # Archivos abiertos y líneas pendientes de escribir, por fecha
+        self._escritores: Dict[str, TextIO] = {}
+        self._buffers: Dict[str, List[str]] = defaultdict(list)
+        self._buffer_bytes: Dict[str, int] = defaultdict(int)
+        self._escritura_lock = threading.Lock()
+        # Volcado diferido pendiente; se programa con el primer mensaje que entra a un buffer vacío
+        self._temporizador: Optional[threading.Timer] = None
 
         # Crear directorio de almacenamiento si no existe
         if self.ruta_almacenamiento:
             os.makedirs(self.ruta_almacenamiento, exist_ok=True)
+            # No perder los mensajes que queden en el buffer al terminar el proceso
+            atexit.register(self.cerrar)
 
     def publicar(self, mensaje: Mensaje) -> str:
         """
@@ -117,12 +188,32 @@ class SistemaMensajeria:
             ID del mensaje publicado
         """
         # Almacenar el mensaje
-        self.mensajes.append(mensaje)
+        self._indexar(mensaje)
 
         # Guardar en disco si está configurado
         if self.ruta_almacenamiento:
             self._guardar_mensaje(mensaje)
 
+        # Despertar a quien espera la respuesta a este mensaje
+        if mensaje.id_respuesta is not None:
+            with self._esperas_lock:
+                evento = self._esperas.get(mensaje.id_respuesta)
+            if evento is not None:
+                evento.set()
+
+        # Entregar al destinatario ('*' entrega a todos los agentes suscritos por nombre salvo al
+        # emisor, que de lo contrario podría responder a su propio mensaje)
+        if mensaje.destinatario == "*":
+            destinatarios = [cb for nombre, cbs in self.suscripciones_destinatario.items()
+                             if nombre != mensaje.emisor for cb in cbs]
+        else:
+            destinatarios = self.suscripciones_destinatario.get(mensaje.destinatario, ())
+        for callback in destinatarios:
+            try:
+                callback(mensaje)
+            except Exception as e:
+                print(f"Error en callback de destinatario: {e}")
+
         # Notificar a los suscriptores del tipo específico
         if mensaje.tipo in self.suscripciones:
             for callback in self.suscripciones[mensaje.tipo]:
@@ -149,11 +240,48 @@ class SistemaMensajeria:
             tipo_mensaje: Tipo de mensaje a suscribir ('*' para todos)
             callback: Función a llamar cuando llegue un mensaje de ese tipo
         """
+        tipo_mensaje = sys.intern(tipo_mensaje)
         if tipo_mensaje not in self.suscripciones:
             self.suscripciones[tipo_mensaje] = []
 
         self.suscripciones[tipo_mensaje].append(callback)
 
+    def tiene_suscriptores(self, tipo_mensaje: str) -> bool:
+        """
+        Indica si algún suscriptor recibiría un mensaje de ese tipo.
+
+        Permite a los emisores omitir notificaciones que nadie va a leer.
+
+        Args:
+            tipo_mensaje: Tipo de mensaje
+
+        Returns:
+            True si hay suscriptores del tipo o generales ('*')
+        """
+        return bool(self.suscripciones.get(tipo_mensaje) or self.suscripciones.get("*"))
+
+    def hay_interes(self, tipo_mensaje: str) -> bool:
+        """
+        Indica si publicar un mensaje de ese tipo tendría algún efecto fuera del historial en memoria.
+
+        Args:
+            tipo_mensaje: Tipo de mensaje
+
+        Returns:
+            True si hay suscriptores del tipo o generales, o si los mensajes se guardan en disco
+        """
+        return bool(self.ruta_almacenamiento) or self.tiene_suscriptores(tipo_mensaje)
+
+    def suscribir_destinatario(self, destinatario: str, callback: callable) -> None:
+        """
+        Suscribe una función de callback para recibir los mensajes dirigidos a un agente.
+
+        Args:
+            destinatario: Nombre del agente
+            callback: Función a llamar cuando llegue un mensaje para ese agente
+        """
+        self.suscripciones_destinatario.setdefault(destinatario, []).append(callback)
+
     def cancelar_suscripcion(self, tipo_mensaje: str, callback: callable) -> bool:
         """
         Cancela una suscripción previamente registrada.
@@ -178,7 +306,8 @@ class SistemaMensajeria:
             desde: Optional[datetime] = None,
             hasta: Optional[datetime] = None,
             id_respuesta: Optional[str] = None,
-            limite: Optional[int] = None
+            limite: Optional[int] = None,
+            tipos: Optional[FrozenSet[str]] = None
     ) -> List[Mensaje]:
         """
         Obtiene mensajes filtrados por varios criterios.
@@ -191,32 +320,41 @@ class SistemaMensajeria:
             hasta: Timestamp de fin
             id_respuesta: Filtrar respuestas a un mensaje específico
             limite: Número máximo de mensajes a retornar
+            tipos: Filtrar por un conjunto de tipos de mensaje
 
         Returns:
-            Lista de mensajes que cumplen los criterios
-        """
-        resultado = self.mensajes.copy()
-
-        # Aplicar filtros
-        if emisor:
-            resultado = [m for m in resultado if m.emisor == emisor]
-        if destinatario:
-            resultado = [m for m in resultado if m.destinatario == destinatario]
-        if tipo:
-            resultado = [m for m in resultado if m.tipo == tipo]
-        if desde:
-            resultado = [m for m in resultado if m.timestamp >= desde]
-        if hasta:
-            resultado = [m for m in resultado if m.timestamp <= hasta]
-        if id_respuesta:
-            resultado = [m for m in resultado if m.id_respuesta == id_respuesta]
-
-        # Ordenar por timestamp (más reciente primero)
-        resultado.sort(key=lambda m: m.timestamp, reverse=True)
-
-        # Aplicar límite si se especificó
-        if limite is not None and limite > 0:
-            resultado = resultado[:limite]
+            Lista de mensajes que cumplen los criterios (más reciente primero)
+        """
+        # Partir del índice más selectivo entre los filtros por igualdad
+        candidatos = self.mensajes
+        for indice, valor in ((self._por_emisor, emisor), (self._por_destinatario, destinatario),
+                              (self._por_tipo, tipo), (self._por_respuesta, id_respuesta)):
+            if valor:
+                lista = indice.get(valor, ())
+                if len(lista) < len(candidatos):
+                    candidatos = lista
+
+        resultado = []
+        # Los candidatos están en orden cronológico: se recorren desde el final para obtener
+        # los más recientes primero y detenerse en cuanto se alcanza el límite
+        for m in reversed(candidatos):
+            if emisor and m.emisor != emisor:
+                continue
+            if destinatario and m.destinatario != destinatario:
+                continue
+            if tipo and m.tipo != tipo:
+                continue
+            if tipos is not None and m.tipo not in tipos:
+                continue
+            if desde and m.timestamp < desde:
+                continue
+            if hasta and m.timestamp > hasta:
+                continue
+            if id_respuesta and m.id_respuesta != id_respuesta:
+                continue
+            resultado.append(m)
+            if limite is not None and 0 < limite <= len(resultado):
+                break
 
         return resultado
 
@@ -230,10 +368,7 @@ class SistemaMensajeria:
         Returns:
             El mensaje si se encuentra, None en caso contrario
         """
-        for mensaje in self.mensajes:
-            if mensaje.id == id_mensaje:
-                return mensaje
-        return None
+        return self._por_id.get(id_mensaje)
 
     def obtener_respuestas(self, id_mensaje: str) -> List[Mensaje]:
         """
@@ -245,7 +380,90 @@ class SistemaMensajeria:
         Returns:
             Lista de mensajes que son respuestas al mensaje especificado
         """
-        return [m for m in self.mensajes if m.id_respuesta == id_mensaje]
+        return list(self._por_respuesta.get(id_mensaje, ()))
+
+    def contar_por_tipo(self) -> Dict[str, int]:
+        """
+        Cuenta los mensajes del historial por tipo, a partir del índice por tipo.
+
+        Returns:
+            Diccionario tipo -> número de mensajes, en orden de primera aparición
+        """
+        return {tipo: len(mensajes) for tipo, mensajes in self._por_tipo.items() if mensajes}
+
+    def registrar_espera(self, id_mensaje: str) -> threading.Event:
+        """
+        Registra un evento que se activará cuando llegue una respuesta al mensaje indicado.
+
+        Debe llamarse antes de publicar el mensaje, ya que los suscriptores pueden
+        responder de forma síncrona dentro de publicar.
+
+        Args:
+            id_mensaje: ID del mensaje cuya respuesta se espera
+
+        Returns:
+            Evento que se activa al publicarse la respuesta
+        """
+        with self._esperas_lock:
+            evento = self._esperas.get(id_mensaje)
+            if evento is None:
+                evento = threading.Event()
+                self._esperas[id_mensaje] = evento
+            return evento
+
+    def esperar_respuesta(self, id_mensaje: str, timeout: Optional[float] = None) -> Optional[Mensaje]:
+        """
+        Bloquea hasta que llegue la primera respuesta a un mensaje o se agote el tiempo.
+
+        Args:
+            id_mensaje: ID del mensaje registrado con registrar_espera
+            timeout: Tiempo máximo de espera en segundos (None para esperar indefinidamente)
+
+        Returns:
+            La primera respuesta recibida, o None si se agotó el tiempo
+        """
+        evento = self.registrar_espera(id_mensaje)
+        try:
+            if not evento.wait(timeout):
+                return None
+        finally:
+            with self._esperas_lock:
+                self._esperas.pop(id_mensaje, None)
+
+        respuestas = self.obtener_respuestas(id_mensaje)
+        return respuestas[0] if respuestas else None
+
+    def _indexar(self, mensaje: Mensaje) -> None:
+        """
+        Añade un mensaje al historial y a los índices conservando el orden cronológico.
+
+        Args:
+            mensaje: Mensaje a añadir
+        """
+        with self._indices_lock:
+            listas = [self.mensajes, self._por_emisor[mensaje.emisor], self._por_tipo[mensaje.tipo]]
+            if mensaje.destinatario is not None:
+                listas.append(self._por_destinatario[mensaje.destinatario])
+            if mensaje.id_respuesta is not None:
+                listas.append(self._por_respuesta[mensaje.id_respuesta])
+
+            for lista in listas:
+                # Lo habitual es que el mensaje sea el más reciente; si no, se inserta en su posición
+                if lista and mensaje.timestamp < lista[-1].timestamp:
+                    bisect.insort(lista, mensaje, key=lambda m: m.timestamp)
+                else:
+                    lista.append(mensaje)
+            self._por_id[mensaje.id] = mensaje
+
+    def _reconstruir_indices(self) -> None:
+        """Reconstruye los índices secundarios a partir del historial completo."""
+        mensajes = self.mensajes
+        self.mensajes = []
+        self._por_id.clear()
+        for indice in (self._por_emisor, self._por_destinatario, self._por_tipo, self._por_respuesta):
+            indice.clear()
+        for mensaje in mensajes:
+            self._indexar(mensaje)
 
     def _guardar_mensaje(self, mensaje: Mensaje) -> None:
         """
@@ -258,16 +476,76 @@ class SistemaMensajeria:
             return
 
         try:
-            # Determinar la ruta del archivo
+            # Determinar el archivo (uno por fecha) y convertir el mensaje a JSON
             fecha = mensaje.timestamp.strftime("%Y%m%d")
-            ruta_archivo = Path(self.ruta_almacenamiento) / f"mensajes_{fecha}.jsonl"
-
-            # Convertir el mensaje a JSON y añadirlo al archivo
-            with open(ruta_archivo, "a", encoding="utf-8") as f:
-                json_mensaje = json.dumps(mensaje.to_dict())
-                f.write(f"{json_mensaje}\n")
+            linea = f"{_serializar(mensaje.to_dict())}\n"
         except Exception as e:
             print(f"Error al guardar mensaje en disco: {e}")
+            return
+
+        # Acumular y escribir por lotes en lugar de abrir el archivo en cada mensaje
+        with self._escritura_lock:
+            buffer = self._buffers[fecha]
+            buffer.append(linea)
+            self._buffer_bytes[fecha] += len(linea)
+            if len(buffer) >= _MAX_BUFFER_MENSAJES or self._buffer_bytes[fecha] >= _MAX_BUFFER_BYTES:
+                self._volcar_fecha(fecha)
+            elif self._temporizador is None:
+                # Escritura en segundo plano: quien publica no espera al disco con pocos mensajes
+                self._temporizador = threading.Timer(_INTERVALO_VOLCADO, self._volcar_diferido)
+                self._temporizador.daemon = True
+                self._temporizador.start()
+
+    def _volcar_diferido(self) -> None:
+        """Vuelca todos los buffers desde el temporizador de escritura."""
+        with self._escritura_lock:
+            self._temporizador = None
+            for fecha in list(self._buffers):
+                self._volcar_fecha(fecha)
+
+    def _volcar_fecha(self, fecha: str) -> None:
+        """
+        Escribe en disco las líneas pendientes de un archivo. Debe llamarse con _escritura_lock tomado.
+
+        Args:
+            fecha: Fecha (YYYYMMDD) del archivo
+        """
+        buffer = self._buffers.pop(fecha, None)
+        self._buffer_bytes.pop(fecha, None)
+        if not buffer:
+            return
+
+        try:
+            f = self._escritores.get(fecha)
+            if f is None:
+                ruta_archivo = Path(self.ruta_almacenamiento) / f"mensajes_{fecha}.jsonl"
+                f = open(ruta_archivo, "a", encoding="utf-8", buffering=1 << 16)
+                self._escritores[fecha] = f
+            f.write("".join(buffer))
+            f.flush()
+        except Exception as e:
+            print(f"Error al guardar mensajes en disco: {e}")
+
+    def volcar(self) -> None:
+        """Escribe en disco todos los mensajes pendientes."""
+        with self._escritura_lock:
+            for fecha in list(self._buffers):
+                self._volcar_fecha(fecha)
+
+    def cerrar(self) -> None:
+        """Escribe los mensajes pendientes y cierra los archivos abiertos."""
+        with self._escritura_lock:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            for fecha in list(self._buffers):
+                self._volcar_fecha(fecha)
+            for f in self._escritores.values():
+                try:
+                    f.close()
+                except OSError as e:
+                    print(f"Error al cerrar archivo de mensajes: {e}")
+            self._escritores.clear()
 
     def cargar_mensajes_desde_disco(self) -> int:
         """
@@ -279,25 +557,36 @@ class SistemaMensajeria:
         if not self.ruta_almacenamiento:
             return 0
 
-        count = 0
+        # Los mensajes aún en el buffer también deben estar en los archivos que se leen
+        self.volcar()
+
+        nuevos = []
+        # IDs ya conocidos, incluidos los leídos en este mismo recorrido, para evitar duplicados
+        conocidos = set(self._por_id)
         try:
             ruta = Path(self.ruta_almacenamiento)
-            for archivo in ruta.glob("mensajes_*.jsonl"):
+            # Los archivos están particionados por fecha: leerlos en orden deja los mensajes casi ordenados
+            for archivo in sorted(ruta.glob("mensajes_*.jsonl")):
                 with open(archivo, "r", encoding="utf-8") as f:
                     for linea in f:
+                        if not linea.strip():
+                            continue
                         try:
-                            data = json.loads(linea.strip())
+                            data = _deserializar(linea)
+                            # Evitar duplicados antes de construir el mensaje y convertir su timestamp
+                            if data.get("id") in conocidos:
+                                continue
                             mensaje = Mensaje.from_dict(data)
-                            # Evitar duplicados
-                            if mensaje.id not in [m.id for m in self.mensajes]:
-                                self.mensajes.append(mensaje)
-                                count += 1
+                            conocidos.add(mensaje.id)
+                            nuevos.append(mensaje)
                         except Exception as e:
                             print(f"Error al cargar mensaje: {e}")
 
-            # Ordenar mensajes por timestamp
-            self.mensajes.sort(key=lambda m: m.timestamp)
+            # Mezclar con el historial (ya ordenado) y reconstruir los índices
+            nuevos.sort(key=lambda m: m.timestamp)
+            self.mensajes = list(heapq.merge(self.mensajes, nuevos, key=lambda m: m.timestamp))
+            self._reconstruir_indices()
         except Exception as e:
             print(f"Error al cargar mensajes desde disco: {e}")
 
-        return count
\ No newline at end of file
+        return len(nuevos)
\ No newline at end of file
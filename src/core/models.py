@@ -1,8 +1,22 @@
 # src/core/models.py
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from pydantic import BaseModel, Field, field_validator
+import itertools
 import re
 
+_RE_ID_STRICT = re.compile(r'^REQ-\d{2,}$')
+_RE_ID_LOOSE = re.compile(r'^REQ-\d+$')
+_RE_DIGITS = re.compile(r'\d+')
+
+# IDs automáticos para cadenas sin ID válido; empiezan en 1000 para no chocar con los REQ-XX generados
+# por el modelo (hash() variaba entre ejecuciones y solo daba 100 valores posibles)
+_AUTO_ID = itertools.count(1000)
+
+
+def _auto_id() -> str:
+    """Devuelve el siguiente ID automático de requerimiento."""
+    return f"REQ-{next(_AUTO_ID)}"
+
 
 class FunctionalRequirement(BaseModel):
     """Modelo para un requerimiento funcional estandarizado."""
@@ -15,7 +29,7 @@ class FunctionalRequirement(BaseModel):
     @field_validator('id')
     def validate_id_format(cls, v):
         """Valida que el ID tenga el formato correcto."""
-        if not re.match(r'^REQ-\d{2,}$', v):
+        if not _RE_ID_STRICT.match(v):
             raise ValueError('El ID debe tener el formato REQ-XX donde XX son números (ej: REQ-01)')
         return v
 
@@ -49,25 +63,25 @@ class FunctionalRequirement(BaseModel):
             parts = req_string.split(':', 1)
             if len(parts) != 2:
                 # Si no tiene el formato esperado, asigna un ID automático
-                return cls(id=f"REQ-{hash(req_string) % 100:02d}", description=req_string.strip())
+                return cls(id=_auto_id(), description=req_string.strip())
 
             req_id = parts[0].strip()
             description = parts[1].strip()
 
             # Valida el formato del ID o lo corrige si es necesario
-            if not re.match(r'^REQ-\d{2,}$', req_id):
-                if re.match(r'^REQ-\d+$', req_id):
+            if not _RE_ID_STRICT.match(req_id):
+                if _RE_ID_LOOSE.match(req_id):
                     # Corregir el formato si tiene menos de 2 dígitos
-                    digits = re.search(r'\d+', req_id).group()
+                    digits = _RE_DIGITS.search(req_id).group()
                     req_id = f"REQ-{int(digits):02d}"
                 else:
                     # Si no tiene el formato correcto, asigna un ID automático
-                    req_id = f"REQ-{hash(req_string) % 100:02d}"
+                    req_id = _auto_id()
 
             return cls(id=req_id, description=description)
         except Exception as e:
             # Si hay algún error, crea un requerimiento con un ID genérico
-            return cls(id=f"REQ-{hash(req_string) % 100:02d}", description=req_string.strip())
+            return cls(id=_auto_id(), description=req_string.strip())
 
 
 class RequirementsList(BaseModel):
@@ -89,10 +103,18 @@ class RequirementsList(BaseModel):
     def add_requirement(self, requirement: FunctionalRequirement):
         self.requirements.append(requirement)
 
+    def extend(self, requirements: Iterable[FunctionalRequirement]):
+        """Agrega varios requerimientos en una sola operación."""
+        self.requirements.extend(requirements)
+
     def get_pending_requirements(self) -> List[FunctionalRequirement]:
         """Retorna los requerimientos pendientes o parciales."""
         return [req for req in self.requirements if req.status != "Completo"]
 
+    def by_id(self) -> Dict[str, FunctionalRequirement]:
+        """Retorna un índice id -> requerimiento para búsquedas en O(1)."""
+        return {req.id: req for req in self.requirements}
+
     def update_requirement_status(self, req_id: str, new_status: str):
         """Actualiza el estado de un requerimiento específico."""
         for req in self.requirements:
@@ -115,8 +137,9 @@ class RequirementsList(BaseModel):
         Crea un objeto RequirementsList a partir de una lista de cadenas de texto.
         """
         instance = cls()
-        for req_string in requirements_strings:
-            if req_string.strip():  # Solo procesa líneas no vacías
-                req = FunctionalRequirement.from_string(req_string)
-                instance.add_requirement(req)
+        instance.extend(
+            FunctionalRequirement.from_string(req_string)
+            for req_string in requirements_strings
+            if req_string.strip()  # Solo procesa líneas no vacías
+        )
         return instance
\ No newline at end of file
@@ -0,0 +1,194 @@
+# src/core/throttle.py
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens que se recarga de forma continua a una tasa fija.
+
+    Permite reservar más de lo disponible: la cubeta queda en negativo y quien reserva
+    espera el tiempo necesario para que se recargue, de modo que las esperas se encadenan
+    en orden de llegada.
+    """
+
+    def __init__(self, capacidad: float, por_segundo: float):
+        self.capacidad = capacidad
+        self.por_segundo = por_segundo
+        self._disponibles = capacidad
+        self._ultima_recarga = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reservar(self, n: float) -> float:
+        """
+        Descuenta n tokens y devuelve los segundos que hay que esperar antes de usarlos.
+
+        Args:
+            n: Número de tokens a reservar.
+
+        Returns:
+            Segundos de espera (0 si había tokens suficientes).
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            self._disponibles = min(self.capacidad,
+                                    self._disponibles + (ahora - self._ultima_recarga) * self.por_segundo)
+            self._ultima_recarga = ahora
+            self._disponibles -= n
+            if self._disponibles >= 0:
+                return 0.0
+            return -self._disponibles / self.por_segundo
+
+    def ajustar_tasa(self, por_segundo: float) -> None:
+        """Cambia la tasa de recarga conservando los tokens acumulados hasta ahora."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._disponibles = min(self.capacidad,
+                                    self._disponibles + (ahora - self._ultima_recarga) * self.por_segundo)
+            self._ultima_recarga = ahora
+            self.por_segundo = por_segundo
+
+    def acquire(self, n: float = 1) -> None:
+        """Reserva n tokens bloqueando el hilo hasta que estén disponibles."""
+        espera = self._reservar(n)
+        if espera > 0:
+            time.sleep(espera)
+
+    async def aacquire(self, n: float = 1) -> None:
+        """Reserva n tokens sin bloquear el event loop."""
+        espera = self._reservar(n)
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+class RateLimiter:
+    """
+    Limitador combinado de peticiones por minuto y tokens por minuto.
+
+    Ajusta la tasa con AIMD: cada error 429 la reduce a la mitad y cada petición correcta
+    recupera una fracción fija de los límites configurados.
+    """
+
+    # Fracción mínima de los límites configurados y paso de recuperación tras cada éxito
+    _FACTOR_MINIMO = 0.1
+    _PASO_RECUPERACION = 0.05
+    # Fracción restante de la cuota del proveedor por debajo de la cual se pausa hasta su reinicio
+    _UMBRAL_RESTANTE = 0.1
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.peticiones = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self._factor = 1.0
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _aplicar_factor(self, factor: float) -> None:
+        """Fija la fracción de los límites configurados que se usa como tasa."""
+        with self._lock:
+            if factor == self._factor:
+                return
+            self._factor = factor
+        self.peticiones.ajustar_tasa(self.rpm * factor / 60.0)
+        self.tokens.ajustar_tasa(self.tpm * factor / 60.0)
+
+    def registrar_exito(self) -> None:
+        """Recupera aditivamente la tasa tras una petición correcta."""
+        if self._factor < 1.0:
+            self._aplicar_factor(min(1.0, self._factor + self._PASO_RECUPERACION))
+
+    def registrar_error(self, error: Exception) -> None:
+        """
+        Reduce la tasa a la mitad si el error es un límite de tasa del proveedor (HTTP 429).
+
+        Args:
+            error: Excepción lanzada por el cliente de OpenAI o Anthropic.
+        """
+        if getattr(error, "status_code", None) == 429:
+            self.reducir()
+
+    def reducir(self) -> None:
+        """Reduce multiplicativamente la tasa, sin bajar del mínimo."""
+        self._aplicar_factor(max(self._FACTOR_MINIMO, self._factor * 0.5))
+
+    def observar_cuota(self, restantes: int, limite: int, reinicio_en: float) -> None:
+        """
+        Registra la cuota restante informada por el proveedor en las cabeceras de la respuesta.
+
+        Con menos del 10% restante, las siguientes peticiones esperan una fracción del tiempo
+        hasta el reinicio (mayor cuanto menos quede), con jitter para no despertar todas a la vez.
+
+        Args:
+            restantes: Peticiones o tokens restantes en la ventana actual.
+            limite: Límite de la ventana.
+            reinicio_en: Segundos hasta que se reinicia la ventana.
+        """
+        if limite <= 0 or reinicio_en <= 0 or restantes >= limite * self._UMBRAL_RESTANTE:
+            return
+        pausa = reinicio_en * (1 - restantes / limite) ** 2
+        pausa += random.uniform(0, pausa * 0.1)
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + pausa)
+
+    def _espera_pendiente(self) -> float:
+        """Segundos que faltan para que termine la pausa pedida por observar_cuota."""
+        return self._pausa_hasta - time.monotonic()
+
+    def acquire(self, tokens_estimados: int) -> None:
+        """
+        Espera hasta poder enviar una petición de tokens_estimados tokens.
+
+        Args:
+            tokens_estimados: Estimación de tokens de la petición.
+        """
+        espera = self._espera_pendiente()
+        if espera > 0:
+            time.sleep(espera)
+        self.peticiones.acquire(1)
+        self.tokens.acquire(tokens_estimados)
+
+    async def aacquire(self, tokens_estimados: int) -> None:
+        """Variante asíncrona de acquire."""
+        espera = self._espera_pendiente()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        await self.peticiones.aacquire(1)
+        await self.tokens.aacquire(tokens_estimados)
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)."""
+    return max(1, len(texto) // 4)
+
+
+_limitadores: Dict[Tuple[str, str], RateLimiter] = {}
+_limitadores_lock = threading.Lock()
+
+
+def obtener_limitador(api_key: str, model: str, rpm: int, tpm: int) -> RateLimiter:
+    """
+    Devuelve el limitador compartido para una clave de API y un modelo.
+
+    Los límites de los proveedores se aplican por organización y modelo, así que todos los agentes
+    que usan la misma clave y modelo comparten la misma cubeta.
+
+    Args:
+        api_key: Clave de API.
+        model: Modelo utilizado.
+        rpm: Peticiones por minuto permitidas.
+        tpm: Tokens por minuto permitidos.
+
+    Returns:
+        RateLimiter: Limitador compartido.
+    """
+    clave = (api_key, model)
+    with _limitadores_lock:
+        limitador = _limitadores.get(clave)
+        if limitador is None:
+            limitador = RateLimiter(rpm, tpm)
+            _limitadores[clave] = limitador
+        return limitador
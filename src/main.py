@@ -1,7 +1,13 @@
 # src/main.py (actualizado con sistema de mensajería)
+import asyncio
+import atexit
+import hashlib
 import os
-import time
 import json
+import queue
+import sys
+import threading
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
@@ -13,13 +19,130 @@ from src.agents.sme import SME
 from src.agents.architect import Architect
 from src.agents.developer import Developer
 
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 def registrar_interaccion(mensaje):
     """Callback para registrar todas las interacciones entre agentes."""
     print(f"📩 Mensaje: {mensaje}")
 
 
-def main():
+def suscribir_registro_interacciones(mensajeria: SistemaMensajeria, tipos: list) -> None:
+    """
+    Suscribe registrar_interaccion a los tipos indicados sin imprimir dentro de publicar.
+
+    Los mensajes se encolan y un hilo en segundo plano los imprime, de modo que la salida
+    por consola no retrasa a quien publica. Al salir del proceso se vacía la cola antes de
+    terminar, para no perder los últimos mensajes.
+
+    Args:
+        mensajeria: Sistema de mensajería
+        tipos: Tipos de mensaje a registrar ('*' para todos)
+    """
+    cola = queue.SimpleQueue()
+    fin = object()
+
+    def imprimir():
+        while True:
+            mensaje = cola.get()
+            if mensaje is fin:
+                return
+            registrar_interaccion(mensaje)
+
+    hilo = threading.Thread(target=imprimir, name="registro-mensajes", daemon=True)
+    hilo.start()
+
+    def vaciar():
+        # El centinela llega después de todos los mensajes ya encolados
+        cola.put(fin)
+        hilo.join()
+
+    atexit.register(vaciar)
+    for tipo in tipos:
+        mensajeria.suscribir(tipo, cola.put)
+
+
+def limites_desde_entorno(proveedor: str) -> dict:
+    """
+    Lee los límites de tasa de un proveedor de las variables de entorno (p. ej. OPENAI_RPM, ANTHROPIC_TPM).
+
+    Args:
+        proveedor: Prefijo de las variables ("OPENAI" o "ANTHROPIC")
+
+    Returns:
+        Argumentos rpm_limit/tpm_limit para AgentConfig; solo los definidos en el entorno
+    """
+    limites = {}
+    for sufijo, campo in (("RPM", "rpm_limit"), ("TPM", "tpm_limit")):
+        valor = os.getenv(f"{proveedor}_{sufijo}")
+        if valor:
+            limites[campo] = int(valor)
+    return limites
+
+
+# Separador de los encabezados de cada fase, construido una sola vez
+BARRA = "=" * 20
+
+# Punto de control de la última iteración terminada, para reanudar una ejecución interrumpida
+RUTA_ESTADO = Path("src/outputs/estado.json")
+
+
+def _huella_descripcion(descripcion: str) -> str:
+    """Hash de la descripción del proyecto, para no reanudar el estado de otro proyecto."""
+    return hashlib.sha256(descripcion.encode("utf-8")).hexdigest()
+
+
+def guardar_estado(descripcion: str, iteracion: int, requerimientos: RequirementsList,
+                   diseno: list, codigo: list) -> None:
+    """
+    Guarda el estado al terminar una iteración, de forma atómica (archivo temporal + os.replace).
+
+    Args:
+        descripcion: Descripción del proyecto
+        iteracion: Número de la siguiente iteración a ejecutar
+        requerimientos: Requerimientos con su estado actual
+        diseno: Diseño técnico de la última iteración
+        codigo: Resumen de la última implementación
+    """
+    estado = {
+        "descripcion_hash": _huella_descripcion(descripcion),
+        "iteracion": iteracion,
+        "requerimientos": [req.model_dump() for req in requerimientos],
+        "diseno": diseno,
+        "codigo": codigo
+    }
+    temporal = RUTA_ESTADO.with_suffix(".tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporal, RUTA_ESTADO)
+
+
+def cargar_estado(descripcion: str):
+    """
+    Carga el punto de control guardado si corresponde a la misma descripción de proyecto.
+
+    Args:
+        descripcion: Descripción del proyecto actual
+
+    Returns:
+        Diccionario con el estado guardado, o None si no hay uno válido para este proyecto
+    """
+    try:
+        with open(RUTA_ESTADO, "r", encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if estado.get("descripcion_hash") != _huella_descripcion(descripcion):
+        return None
+    return estado
+
+
+async def main():
     try:
         load_dotenv()
         API_KEY = os.getenv("OPENAI_API_KEY")
@@ -38,9 +161,13 @@ def main():
         # Configurar el sistema de mensajería para todos los agentes
         Agent.configurar_mensajeria(mensajeria)
 
-        # Suscribirse a todos los mensajes para logging (opcional)
-        if os.getenv("DEBUG_MENSAJES", "false").lower() == "true":
-            mensajeria.suscribir("*", registrar_interaccion)
+        # Registrar mensajes para depuración (opcional): "true" para todos, o una lista de tipos
+        # separados por comas; suscribirse solo a algunos tipos evita construir el resto de notificaciones
+        debug_mensajes = os.getenv("DEBUG_MENSAJES", "false").strip()
+        if debug_mensajes.lower() == "true":
+            suscribir_registro_interacciones(mensajeria, ["*"])
+        elif debug_mensajes.lower() != "false" and debug_mensajes:
+            suscribir_registro_interacciones(mensajeria, [t.strip() for t in debug_mensajes.split(",") if t.strip()])
 
         # === Configuración base común para todos los agentes ===
         common_config = {
@@ -48,34 +175,47 @@ def main():
             "api_key": API_KEY,
             "model": "gpt-4o-mini",
             "verbose": True,
-            "output_dir": "src/outputs"
+            "output_dir": "src/outputs",
+            **limites_desde_entorno("OPENAI")
         }
 
-        # Inicializar agentes
-        print("\nInicializando Agente SME...")
-        sme = SME(config=AgentConfig(
-            name="SME",
-            prompt_path="src/prompts/sme.txt",
-            **common_config
-        ))
-
-        print("\nInicializando Agente Solution Architect...")
-        arquitecto = Architect(config=AgentConfig(
-            name="Architect",
-            prompt_path="src/prompts/architect.txt",
-            **common_config
-        ))
-
-        print("\nInicializando Agente Developer (Claude 3 Sonnet)...")
-        developer = Developer(config=AgentConfig(
-            name="Developer",
-            prompt_path="src/prompts/developer.txt",
-            provider="anthropic",
-            api_key=ANTHROPIC_API_KEY,
-            model="claude-3-7-sonnet-20250219",
-            verbose=True,
-            output_dir="src/outputs"
-        ))
+        # Caché de respuestas en disco para desarrollo: la misma descripción de proyecto reutiliza
+        # los requerimientos y diseños ya generados en ejecuciones anteriores sin volver a llamar a la API.
+        # La clave incluye el prompt de sistema de cada agente, así que las respuestas no se mezclan.
+        cache_respuestas = os.getenv("CACHE_RESPUESTAS", "false").lower() == "true"
+        opciones_cache = {
+            "cacheable": cache_respuestas,
+            "cache_path": "src/outputs/cache_respuestas.sqlite" if cache_respuestas else None
+        }
+
+        # Inicializar agentes en paralelo: SME y Architect buscan o crean su asistente en la API
+        # de OpenAI al construirse, así que el arranque tarda lo que el más lento y no la suma
+        print("\nInicializando agentes SME, Solution Architect y Developer (Claude 3 Sonnet)...")
+        sme, arquitecto, developer = await asyncio.gather(
+            asyncio.to_thread(SME, config=AgentConfig(
+                name="SME",
+                prompt_path="src/prompts/sme.txt",
+                response_format={"type": "json_object"},
+                **opciones_cache,
+                **common_config
+            )),
+            asyncio.to_thread(Architect, config=AgentConfig(
+                name="Architect",
+                prompt_path="src/prompts/architect.txt",
+                **opciones_cache,
+                **common_config
+            )),
+            asyncio.to_thread(Developer, config=AgentConfig(
+                name="Developer",
+                prompt_path="src/prompts/developer.txt",
+                provider="anthropic",
+                api_key=ANTHROPIC_API_KEY,
+                model="claude-3-7-sonnet-20250219",
+                verbose=True,
+                output_dir="src/outputs",
+                **limites_desde_entorno("ANTHROPIC")
+            ))
+        )
 
         # Inicializar los sistemas de mensajería de cada agente
         print("\nConfigurando capacidades de comunicación entre agentes...")
@@ -123,11 +263,22 @@ def main():
         diseno_actual = []
         codigo_actual = []
 
-        print(f"\n{'=' * 20} INICIANDO CICLO DE DESARROLLO COLABORATIVO {'=' * 20}")
+        # Reanudar desde el último punto de control si la ejecución anterior del mismo proyecto se
+        # interrumpió; las iteraciones ya terminadas no vuelven a llamar a la API
+        estado = cargar_estado(descripcion_general)
+        if estado:
+            iteracion_actual = estado["iteracion"]
+            todos_los_requerimientos = RequirementsList(requirements=estado["requerimientos"])
+            diseno_actual = estado["diseno"]
+            codigo_actual = resumen_implementacion = estado["codigo"]
+            developer.iteration_count = iteracion_actual - 1
+            print(f"\nReanudando desde la iteración {iteracion_actual} (estado guardado en {RUTA_ESTADO})")
+
+        print(f"\n{BARRA} INICIANDO CICLO DE DESARROLLO COLABORATIVO {BARRA}")
         print(f"\nDescripción inicial del proyecto: {descripcion_general}")
 
         while True:
-            print(f"\n{'=' * 20} ITERACIÓN {iteracion_actual} {'=' * 20}")
+            print(f"\n{BARRA} ITERACIÓN {iteracion_actual} {BARRA}")
 
             # Notificar inicio de iteración
             mensajeria.publicar(
@@ -155,7 +306,7 @@ def main():
                 """
 
                 # La respuesta ahora es un RequirementsList estructurado
-                todos_los_requerimientos = sme.run(prompt_sme)
+                todos_los_requerimientos = await sme.arun(prompt_sme)
 
                 # Notificar requerimientos generados
                 reqs_dict = [{"id": req.id, "descripcion": req.description, "prioridad": req.priority}
@@ -200,10 +351,12 @@ def main():
                     )
 
                     # Usar el nuevo método que verifica directamente el proyecto
-                    todos_completos, estados_reqs = sme.verificar_requerimientos_proyecto(
+                    verificacion = await sme.averificar_requerimientos_proyecto(
                         todos_los_requerimientos,
                         developer.project_path
                     )
+                    todos_completos = verificacion.todos_completos
+                    estados_reqs = verificacion.requirements_status
 
                     # Notificar resultados de verificación
                     mensajeria.publicar(
@@ -213,7 +366,7 @@ def main():
                             contenido=f"Verificación completada: {len(estados_reqs)} requerimientos revisados",
                             metadata={
                                 "todos_completos": todos_completos,
-                                "estados": estados_reqs
+                                "estados": list(estados_reqs)
                             }
                         )
                     )
@@ -235,7 +388,7 @@ def main():
                 else:
                     print("[SME] No se encontró un proyecto para verificar.")
                     # Usar el método antiguo si no hay proyecto
-                    todos_completos = sme.verificar_requerimientos(todos_los_requerimientos, codigo_actual)
+                    todos_completos = await sme.averificar_requerimientos(todos_los_requerimientos, codigo_actual)
 
                 if todos_completos:
                     print("¡Todos los requerimientos han sido implementados correctamente!")
@@ -282,8 +435,8 @@ def main():
             # Convertir los requerimientos pendientes a strings para mantener compatibilidad con Architect
             reqs_strings = [f"{req.id}: {req.description}" for req in requerimientos_pendientes]
 
-            # Pasar los requerimientos al arquitecto
-            diseno_actual = arquitecto.run(reqs_strings)
+            # Pasar los requerimientos al arquitecto con el cliente asíncrono
+            diseno_actual = await arquitecto.arun(reqs_strings)
 
             # Notificar diseño completado
             mensajeria.publicar(
@@ -292,8 +445,8 @@ def main():
                     tipo="diseno_completado",
                     contenido=f"Diseño creado para {len(requerimientos_pendientes)} requerimientos pendientes",
                     metadata={
-                        "diseno_length": len("\n".join(diseno_actual)) if isinstance(diseno_actual, list) else len(
-                            diseno_actual)
+                        # Longitud del diseño unido por saltos de línea, sin construir la cadena completa
+                        "diseno_length": sum(map(len, diseno_actual)) + max(len(diseno_actual) - 1, 0)
                     }
                 )
             )
@@ -317,7 +470,7 @@ def main():
 
             # Pasar los requerimientos y el diseño al desarrollador
             # Ahora devuelve un resumen de lo actualizado
-            resumen_implementacion = developer.run(reqs_strings, diseno_actual)
+            resumen_implementacion = await developer.arun(reqs_strings, diseno_actual)
 
             # Notificar implementación completada
             mensajeria.publicar(
@@ -337,6 +490,10 @@ def main():
             # Incrementar el contador de iteraciones
             iteracion_actual += 1
 
+            # Guardar el punto de control de la iteración terminada
+            guardar_estado(descripcion_general, iteracion_actual, todos_los_requerimientos,
+                           diseno_actual, codigo_actual)
+
             # Verificar si se ha alcanzado el límite de iteraciones
             if iteracion_actual >= max_iteraciones:
                 print(f"\n⚠️ Se ha alcanzado el límite máximo de {max_iteraciones} iteraciones.")
@@ -356,31 +513,38 @@ def main():
 
                 break
 
-            # Pequeña pausa para evitar límites de tasa de la API
+            # Sin pausa fija: los limitadores de cada proveedor esperan solo si no hay capacidad
             print("\nPreparando siguiente iteración...")
-            time.sleep(2)
+
+        # El ciclo terminó: la próxima ejecución del mismo proyecto empieza desde cero
+        RUTA_ESTADO.unlink(missing_ok=True)
 
         # Al finalizar, guardar toda la información del proyecto en un archivo JSON
-        print(f"\n{'=' * 20} DESARROLLO COMPLETADO {'=' * 20}")
+        print(f"\n{BARRA} DESARROLLO COMPLETADO {BARRA}")
 
         # Crear un resumen detallado del proyecto final
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        # Un único instante de finalización para los nombres de archivo y la fecha del resumen
+        finalizacion = datetime.now()
+        timestamp = finalizacion.strftime('%Y%m%d%H%M%S')
         resumen_final_path = Path(f"src/outputs/RESUMEN-FINAL-{timestamp}.md")
 
         with open(resumen_final_path, "w", encoding="utf-8") as f:
             f.write(f"# Resumen Final del Proyecto\n\n")
             f.write(f"## Descripción\n{descripcion_general}\n\n")
 
+            # Un único recorrido escribe cada requerimiento y cuenta los estados para las estadísticas
             f.write(f"## Requerimientos\n")
+            conteo_estados = Counter()
             for req in todos_los_requerimientos:
+                conteo_estados[req.status] += 1
                 emoji = "✅" if req.status == "Completo" else "⚠️" if req.status == "Parcial" else "❌"
                 f.write(f"{emoji} **{req.id}** ({req.status}): {req.description}\n")
 
             f.write(f"\n## Estadísticas\n")
             total_reqs = len(todos_los_requerimientos)
-            completos = sum(1 for req in todos_los_requerimientos if req.status == "Completo")
-            parciales = sum(1 for req in todos_los_requerimientos if req.status == "Parcial")
-            pendientes = sum(1 for req in todos_los_requerimientos if req.status == "Pendiente")
+            completos = conteo_estados["Completo"]
+            parciales = conteo_estados["Parcial"]
+            pendientes = conteo_estados["Pendiente"]
 
             f.write(f"- **Total de requerimientos:** {total_reqs}\n")
             f.write(f"- **Completados:** {completos} ({completos / total_reqs * 100:.1f}%)\n")
@@ -393,11 +557,8 @@ def main():
 
             f.write(f"\n## Estadísticas de comunicación\n")
             total_mensajes = len(mensajeria.mensajes)
-            mensajes_por_tipo = {}
-            for m in mensajeria.mensajes:
-                if m.tipo not in mensajes_por_tipo:
-                    mensajes_por_tipo[m.tipo] = 0
-                mensajes_por_tipo[m.tipo] += 1
+            # El índice por tipo del sistema de mensajería ya agrupa el historial: sin recorrer los mensajes
+            mensajes_por_tipo = mensajeria.contar_por_tipo()
 
             f.write(f"- **Total de mensajes intercambiados:** {total_mensajes}\n")
             f.write(f"- **Desglose por tipo:**\n")
@@ -405,7 +566,7 @@ def main():
                 f.write(f"  - {tipo}: {count}\n")
 
             f.write(f"\n## Fecha de finalización\n")
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"{finalizacion.strftime('%Y-%m-%d %H:%M:%S')}\n")
 
         # Guardar también el resumen en formato JSON
         proyecto_info = {
@@ -430,14 +591,19 @@ def main():
                 "por_tipo": mensajes_por_tipo
             },
             "iteraciones_completadas": iteracion_actual - 1,
-            "todos_requerimientos_completados": all(req.status == "Completo" for req in todos_los_requerimientos),
+            "todos_requerimientos_completados": completos == total_reqs,
             "ubicacion_proyecto": str(developer.project_path) if developer.project_path else "No disponible"
         }
 
         # Guardar el resumen en un archivo JSON
         resumen_json_path = os.path.join("src/outputs", f"resumen-proyecto-{timestamp}.json")
-        with open(resumen_json_path, "w", encoding="utf-8") as f:
-            json.dump(proyecto_info, f, indent=2, ensure_ascii=False)
+        if ORJSON_AVAILABLE:
+            # orjson escribe UTF-8 directamente (equivalente a ensure_ascii=False)
+            with open(resumen_json_path, "wb") as f:
+                f.write(orjson.dumps(proyecto_info, option=orjson.OPT_INDENT_2))
+        else:
+            with open(resumen_json_path, "w", encoding="utf-8") as f:
+                json.dump(proyecto_info, f, indent=2, ensure_ascii=False)
 
         # Notificar finalización del proyecto
         mensajeria.publicar(
@@ -457,9 +623,9 @@ def main():
         print(f"Datos JSON guardados en: {resumen_json_path}")
 
         # Mostrar el resumen de la implementación
+        # Una sola escritura en lugar de un print por línea
         print("\nResumen de la implementación:")
-        for linea in resumen_implementacion:
-            print(linea)
+        sys.stdout.write("\n".join(resumen_implementacion) + "\n")
 
         # Mostrar información sobre donde encontrar los archivos
         if developer.project_path:
@@ -502,4 +668,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file